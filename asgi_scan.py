@@ -0,0 +1,265 @@
+"""Асинхронный сервис отметок: /api/scan и ротация токенов QR без потока на запрос.
+
+    uvicorn asgi_scan:app --workers 2
+
+Тот же SECRET_KEY, DATABASE_URL и CACHE_URL, что у Flask-приложения: сервис
+читает cookie сессии Flask, проверяет те же токены и пишет в те же таблицы.
+Балансировщик направляет сюда POST /api/scan и GET /api/qr/<id>/token,
+остальное — в Flask. Сессии занятий видны обоим, только если CACHE_URL общий
+(sqlite:/// или redis://), иначе проверка группы идёт через кэш занятий и БД.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from models import User, ScheduleItem
+from helpers import (insert_attendance_rows, get_qr_image, configure_qr_cache, CachedUser,
+                     ITEM_CACHE_TTL, USER_CACHE_TTL)
+from sessions import SessionStore, QR_TOKEN_TTL, lesson_ended
+from settings import env
+from cache import shared_cache
+from dbpool import engine_options_from_env
+from instrumentation import setup_logging
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+setup_logging(env('LOG_LEVEL'), burst=int(env('LOG_RATE_LIMIT')))
+log = logging.getLogger(__name__)
+
+SECRET_KEY = env('SECRET_KEY')
+DATABASE_URL = env('DATABASE_URL')
+SESSION_COOKIE_NAME = env('SESSION_COOKIE_NAME')
+SESSION_MAX_AGE = timedelta(days=31).total_seconds()  # PERMANENT_SESSION_LIFETIME у Flask
+
+QR_OPTIONS = (
+    int(env('QR_VERSION')) if env('QR_VERSION') else None,
+    env('QR_ERROR_CORRECTION'),
+    int(env('QR_MASK_PATTERN')) if env('QR_MASK_PATTERN') else None,
+)
+configure_qr_cache(int(env('QR_CACHE_SIZE')))
+shared_cache.configure(env('CACHE_URL'), maxsize=int(env('CACHE_SIZE')),
+                      local_max_ttl=float(env('CACHE_LOCAL_TTL')))
+
+token_serializer = URLSafeTimedSerializer(SECRET_KEY)
+lecture_sessions = SessionStore(shared_cache)
+
+# Cookie сессии подписывается так же, как в SecureCookieSessionInterface Flask
+_session_interface = SecureCookieSessionInterface()
+_cookie_serializer = URLSafeTimedSerializer(
+    SECRET_KEY,
+    salt=_session_interface.salt,
+    serializer=_session_interface.serializer,
+    signer_kwargs={
+        'key_derivation': _session_interface.key_derivation,
+        'digest_method': _session_interface.digest_method,
+    },
+)
+
+
+def async_database_url(uri):
+    """URL с асинхронным драйвером: asyncpg для PostgreSQL, aiosqlite для SQLite."""
+    url = make_url(uri.replace('postgres://', 'postgresql://', 1))
+    backend = url.get_backend_name()
+    if backend == 'postgresql':
+        return url.set(drivername='postgresql+asyncpg')
+    if backend == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+        # Относительный путь Flask-SQLAlchemy считает от папки instance
+        if url.database and url.database != ':memory:' and not os.path.isabs(url.database):
+            url = url.set(database=os.path.join(ROOT, 'instance', url.database))
+        return url
+    raise ValueError(f"Нет асинхронного драйвера для {backend}")
+
+
+def _engine_options(uri):
+    options = engine_options_from_env(uri)
+    # Асинхронный движок сам берёт AsyncAdaptedQueuePool
+    options.pop('poolclass', None)
+    return options
+
+
+engine = create_async_engine(async_database_url(DATABASE_URL), **_engine_options(DATABASE_URL))
+
+
+def _error(message, status):
+    return JSONResponse({'status': 'error', 'message': message}, status_code=status)
+
+
+async def _cache_call(fn, *args, **kwargs):
+    """Обращение к кэшу/SessionStore: Redis и SQLite — сетевой и файловый ввод-вывод,
+    их вызываем в пуле потоков; локальный LRU — сразу, в цикле событий."""
+    if shared_cache.is_shared:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+async def get_current_user(request):
+    """Пользователь (CachedUser) из cookie сессии Flask-Login или None."""
+    cookie = request.cookies.get(SESSION_COOKIE_NAME)
+    if not cookie:
+        return None
+    try:
+        session = _cookie_serializer.loads(cookie, max_age=SESSION_MAX_AGE)
+    except BadSignature:
+        return None
+    user_id = session.get('_user_id')
+    if user_id is None:
+        return None
+    # Тот же user:<id>, что у load_user во Flask
+    info = await _cache_call(shared_cache.get, f'user:{user_id}')
+    if info is None:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(User.username, User.role, User.group).where(User.id == int(user_id))
+            )
+            row = result.first()
+        if row is None:
+            return None
+        info = (row.username, row.role, row.group)
+        await _cache_call(shared_cache.set, f'user:{user_id}', info,
+                          ttl=shared_cache.data_ttl(USER_CACHE_TTL))
+    return CachedUser(int(user_id), *info)
+
+
+async def get_item_info(item_id):
+    """Как helpers.get_item_info, но запрос к БД — через асинхронный драйвер."""
+    info = await _cache_call(shared_cache.get, f'item:{item_id}')
+    if info is None:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(ScheduleItem.group_name, ScheduleItem.teacher_id, ScheduleItem.end_time)
+                .where(ScheduleItem.id == item_id)
+            )
+            row = result.first()
+        if row is None:
+            return None
+        info = (row.group_name, row.teacher_id, row.end_time)
+        await _cache_call(shared_cache.set, f'item:{item_id}', info,
+                          ttl=shared_cache.data_ttl(ITEM_CACHE_TTL))
+    return info
+
+
+async def api_scan(request):
+    user = await get_current_user(request)
+    if user is None:
+        return _error('Требуется вход', 401)
+    if user.role != 'student':
+        return _error('Только для студентов', 403)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return _error('Не хватает данных', 400)
+    item_id_str = str(data.get('item_id', '')).strip()
+    date_str = str(data.get('date', '')).strip()
+    token = str(data.get('token', '')).strip()
+    if not all([item_id_str, date_str, token]):
+        return _error('Не хватает данных', 400)
+
+    try:
+        token_data = token_serializer.loads(token, max_age=QR_TOKEN_TTL)
+    except SignatureExpired:
+        return _error('QR-код устарел (прошло более 5 секунд)', 400)
+    except BadSignature:
+        return _error('Недействительный QR-код', 400)
+
+    expected_item_id, expected_date, *seed = token_data.split(':', 2)
+    if expected_item_id != item_id_str or expected_date != date_str:
+        return _error('Несоответствие данных в токене', 400)
+    try:
+        item_id = int(item_id_str)
+    except ValueError:
+        return _error('Неверный формат ID занятия', 400)
+    try:
+        attendance_date = date.fromisoformat(date_str)
+    except ValueError:
+        return _error('Неверный формат даты', 400)
+
+    lecture = await _cache_call(lecture_sessions.get, item_id) if seed else None
+    if lecture and lecture.seed == seed[0] and lecture.date_str == date_str:
+        group_name = lecture.group_name
+    else:
+        info = await get_item_info(item_id)
+        group_name = info[0] if info else None
+        if group_name is not None and lesson_ended(date_str, info[2]):
+            return _error('Занятие уже закончилось', 410)
+    if group_name is None or group_name != user.group:
+        return _error('Занятие не найдено для вашей группы', 404)
+
+    try:
+        async with engine.begin() as conn:
+            inserted = await conn.run_sync(insert_attendance_rows, [{
+                'student_id': user.id,
+                'schedule_item_id': item_id,
+                'date': attendance_date,
+            }])
+    except Exception as e:
+        log.exception("Ошибка в asgi api_scan: %s", e)
+        return _error('Внутренняя ошибка сервера', 500)
+
+    if not inserted:
+        return _error('Вы уже отметились', 409)
+    return JSONResponse({'status': 'success', 'message': 'Посещение засчитано!'})
+
+
+async def api_qr_token(request):
+    """Следующий токен для открытого QR — то же, что /api/qr/<id>/token во Flask."""
+    user = await get_current_user(request)
+    if user is None:
+        return JSONResponse({'error': 'Требуется вход'}, status_code=401)
+    if user.role != 'teacher':
+        return JSONResponse({'error': 'Только для преподавателей'}, status_code=403)
+
+    item_id = request.path_params['item_id']
+    info = await get_item_info(item_id)
+    if not info or info[1] != user.id:
+        return JSONResponse({'error': 'Занятие не найдено'}, status_code=404)
+
+    today = date.today().strftime('%Y-%m-%d')
+    group_name, teacher_id, end_time = info
+    lecture = await _cache_call(lecture_sessions.open, item_id, group_name, teacher_id, today, end_time)
+    if lecture is None:
+        return JSONResponse({'error': 'Занятие уже закончилось'}, status_code=410)
+    token = token_serializer.dumps(lecture.token_data())
+    result = {
+        'item_id': item_id,
+        'date': today,
+        'token': token,
+        'expires_in': QR_TOKEN_TTL,
+        'image_url': f'/qr-image/{item_id}/{today}/{token}',
+    }
+    if request.query_params.get('inline'):
+        scan_url = f"{request.base_url}scan?" + urlencode({'item_id': item_id, 'date': today, 'token': token})
+        # Отрисовка QR нагружает процессор — не держим на ней цикл событий
+        image, _ = await asyncio.to_thread(get_qr_image, scan_url, 'svg', *QR_OPTIONS)
+        result['svg'] = image.decode()
+    return JSONResponse(result)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/scan', api_scan, methods=['POST']),
+        Route('/api/qr/{item_id:int}/token', api_qr_token),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,98 @@
+"""Массовый импорт пользователей: строк в секунду против регистрации по одному.
+
+    python -m bench.bulk_import --users 5000
+    python -m bench.bulk_import --users 20000 --workers 1 4 8 --batch-size 1000
+
+Один и тот же CSV импортируется в пустую таблицу с разным числом процессов
+хеширования; для сравнения — вставка по одному с коммитом на пользователя,
+как при /register (на первых --baseline строках). Метод хеширования — текущий
+PASSWORD_HASH_METHOD. Проверяется, что добавлены все строки и нет конфликтов.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+from bench.common import load_app, add_db_arguments
+from bench.generate import empty
+
+
+def write_roster(path, users, groups=50):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['username', 'password', 'role', 'group'])
+        for i in range(users):
+            writer.writerow([f'student-{i}', f'password-{i}', 'student', f'G-{i % groups}'])
+
+
+def one_by_one(app_module, path, limit):
+    from models import db, User
+    from bulk_import import iter_table, parse_roster_row
+
+    empty(app_module)
+    with app_module.app.app_context(), open(path, 'rb') as stream:
+        t0 = time.perf_counter()
+        for count, (_, row) in enumerate(iter_table(stream, path), 1):
+            data = parse_roster_row(row)
+            user = User(username=data['username'], role=data['role'], group=data['group'])
+            user.set_password(data['password'])
+            db.session.add(user)
+            db.session.commit()
+            if count >= limit:
+                break
+        return count, time.perf_counter() - t0
+
+
+def bulk(app_module, path, batch_size, workers):
+    from models import db, User
+    from bulk_import import run_import
+
+    empty(app_module)
+    with app_module.app.app_context():
+        report = run_import('roster', path, path, batch_size=batch_size, workers=workers)
+        return report, db.session.query(User).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--baseline', type=int, default=200, help='пользователей в замере «по одному»')
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    app_module = load_app(args.db, args.drop)
+    from models import PASSWORD_HASH_METHOD
+
+    fd, path = tempfile.mkstemp(prefix='qr-roster-', suffix='.csv')
+    os.close(fd)
+    failures = []
+    try:
+        write_roster(path, args.users)
+        print(f"{args.users} пользователей, хеш {PASSWORD_HASH_METHOD}, ядер {os.cpu_count()}")
+
+        count, elapsed = one_by_one(app_module, path, args.baseline)
+        print(f"по одному (как /register): {count / elapsed:.1f} пользователей/с")
+
+        for workers in sorted(set(args.workers)):
+            report, total = bulk(app_module, path, args.batch_size, workers)
+            print(f"импорт, процессов {workers}: {report.read / report.elapsed:.1f} пользователей/с "
+                  f"({report.elapsed:.1f} с)")
+            if report.inserted != args.users or total != args.users or report.conflicts or report.errors:
+                failures.append(f"процессов {workers}: добавлено {report.inserted}, в таблице {total}, "
+                                f"конфликтов {report.conflicts}, ошибок {report.errors}")
+    finally:
+        os.remove(path)
+
+    if failures:
+        for failure in failures:
+            print(f"ОШИБКА: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
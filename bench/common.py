@@ -0,0 +1,109 @@
+"""Общие вещи для бенчмарков: временная БД, наполнение, статистика."""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def add_db_arguments(parser):
+    parser.add_argument('--db', default=None,
+                        help='URL одноразовой БД (по умолчанию — временный SQLite); таблицы в ней пересоздаются')
+    parser.add_argument('--drop', action='store_true', help='подтвердить, что все таблицы в --db можно удалить')
+
+
+def load_app(db_url=None, drop=False):
+    """Импортирует app.py поверх указанной (или временной SQLite) БД.
+
+    Бенчмарки удаляют и создают таблицы заново, поэтому переданную БД трогаем
+    только с drop=True (флаг --drop).
+    """
+    if db_url is None:
+        fd, path = tempfile.mkstemp(prefix='qr-bench-', suffix='.db')
+        os.close(fd)
+        db_url = f'sqlite:///{path}'
+    elif not drop:
+        from sqlalchemy.engine import make_url
+        shown = make_url(db_url).render_as_string(hide_password=True)
+        sys.exit(f"ОШИБКА: бенчмарк удалит все таблицы в {shown}. Если это одноразовая БД, добавьте --drop")
+    os.environ['DATABASE_URL'] = db_url
+    import app as app_module
+    return app_module
+
+
+def login_client(flask_app, user_id):
+    """Тестовый клиент с уже залогиненным пользователем (без проверки пароля)."""
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def burst(clients, make_request):
+    """Одновременно запускает по запросу от каждого клиента.
+
+    Возвращает (общее время, [(status, latency)]).
+    """
+    barrier = threading.Barrier(len(clients) + 1)
+    results = [None] * len(clients)
+
+    def worker(i, client):
+        barrier.wait()
+        t0 = time.perf_counter()
+        resp = make_request(i, client)
+        results[i] = (resp.status_code, time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=worker, args=(i, c)) for i, c in enumerate(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, results
+
+
+def report(title, elapsed, results):
+    latencies = [lat for _, lat in results]
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{title}: {len(results)} запросов за {elapsed:.3f} с — "
+          f"{len(results) / elapsed:.0f} req/s, "
+          f"p50 {percentile(latencies, 50) * 1000:.1f} мс, "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} мс, "
+          f"статусы {statuses}")
+
+
+class QueryCounter:
+    """Считает SQL-запросы к движку внутри блока with."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
@@ -0,0 +1,42 @@
+"""Микробенчмарк подсчёта ожидаемых занятий: таблица семестра против обхода по дням.
+
+    python -m bench.expected_lectures
+
+Совпадение с обходом на случайных семестрах проверяет tests/test_expected_lectures.py.
+"""
+import timeit
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from bench.common import ROOT  # noqa: F401 — добавляет корень репозитория в sys.path
+from term import AcademicTerm
+
+
+def count_expected_lectures_loop(term, schedule_item, start_date, end_date):
+    # Эталон: перебор всех дней с той же конвенцией чётности (недели с понедельника,
+    # неделя 1 — та, где начало семестра, нечётная)
+    first_monday = term.start - timedelta(days=term.start.weekday())
+    count = 0
+    current = start_date
+    while current <= end_date:
+        if term.is_teaching_day(current) and current.isoweekday() == schedule_item.day_of_week:
+            week_num = (current - first_monday).days // 7 + 1
+            if week_num % 2 == schedule_item.week_parity:
+                count += 1
+        current += timedelta(days=1)
+    return count
+
+
+def main():
+    term = AcademicTerm(date(2025, 9, 1), date(2025, 12, 31), {date(2025, 11, 4)})
+    items = [SimpleNamespace(id=i, day_of_week=i % 6 + 1, week_parity=i % 2) for i in range(20)]
+    start, end = date(2025, 9, 1), date(2025, 12, 20)
+    n = 200
+    loop = timeit.timeit(lambda: [count_expected_lectures_loop(term, i, start, end) for i in items], number=n)
+    table = timeit.timeit(lambda: [term.count_lessons(i.day_of_week, i.week_parity, start, end)
+                                   for i in items], number=n)
+    print(f"20 занятий за семестр: обход {loop / n * 1e6:.0f} мкс, таблица {table / n * 1e6:.0f} мкс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Живая лента посещаемости: цена обновления через SSE против перезагрузки списка.
+
+    python -m bench.live_feed
+    python -m bench.live_feed --students 300 --scans 100
+
+1. Перезагрузка /api/teacher/attendance: время, байты и SQL-запросы на одно обновление.
+2. SSE /api/teacher/attendance/live: студенты отмечаются по одному, замеряется задержка
+   от отметки до события и байты на событие; SQL-запросов поток почти не делает.
+3. Отметки, записанные в обход сессии (как из другого воркера или ASGI-сервиса),
+   приходят через опрос БД раз в LIVE_POLL_INTERVAL.
+   Поток живёт LIVE_STREAM_SECONDS и переоткрывается с Last-Event-ID, как это делает EventSource.
+4. Медленный клиент: буфер подписки не растёт выше LIVE_BUFFER_SIZE, пропущенное
+   поток дочитывает из БД.
+Если хоть одна отметка не дошла — код выхода 1.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import time as dtime
+from urllib.parse import quote
+
+from bench.common import load_app, add_db_arguments, login_client, percentile, QueryCounter
+from bench.generate import one_lesson
+from settings import env
+
+
+class StreamReader(threading.Thread):
+    """Читает SSE-поток в отдельном потоке, пока не придёт expected событий scan.
+
+    Как EventSource: после закрытия потока переподключается с Last-Event-ID.
+    """
+
+    def __init__(self, client, url, expected, timeout=30):
+        super().__init__(daemon=True)
+        self.client = client
+        self.url = url
+        self.expected = expected
+        self.timeout = timeout
+        self.snapshot = threading.Event()
+        self.received = {}  # student_id -> время получения
+        self.bytes = 0
+        self.connections = 0
+
+    def run(self):
+        last_event_id = None
+        deadline = time.monotonic() + self.timeout
+        while len(self.received) < self.expected and time.monotonic() < deadline:
+            headers = {'Last-Event-ID': last_event_id} if last_event_id is not None else {}
+            resp = self.client.get(self.url, headers=headers, buffered=False)
+            self.connections += 1
+            buffer = ''
+            try:
+                for chunk in resp.response:
+                    self.bytes += len(chunk)
+                    buffer += chunk.decode()
+                    while '\n\n' in buffer:
+                        message, buffer = buffer.split('\n\n', 1)
+                        fields = dict(line.split(': ', 1) for line in message.splitlines() if ': ' in line)
+                        last_event_id = fields.get('id', last_event_id)
+                        if fields.get('event') == 'snapshot':
+                            self.snapshot.set()
+                        elif fields.get('event') == 'scan':
+                            self.received.setdefault(json.loads(fields['data'])['id'], time.perf_counter())
+                    if len(self.received) >= self.expected:
+                        break
+            finally:
+                resp.close()
+
+
+def check_buffer(buffer_size):
+    from live import attendance_feed
+    from datetime import date, datetime
+
+    subscription = attendance_feed.subscribe(-1, date.today())
+    try:
+        attendance_feed.publish([(i, -1, date.today(), datetime.now()) for i in range(buffer_size * 10)])
+        events, overflowed = subscription.wait(0)
+    finally:
+        attendance_feed.unsubscribe(subscription)
+    print(f"медленный клиент: {buffer_size * 10} событий -> в буфере {len(events)}, "
+          f"переполнение {'да' if overflowed else 'нет'} (дочитывается из БД)")
+    return len(events) <= buffer_size and overflowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--scans', type=int, default=100, help='отметок через сессию (публикация при коммите)')
+    parser.add_argument('--direct', type=int, default=20, help='отметок в обход сессии (через опрос БД)')
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--stream-seconds', type=float, default=0.2,
+                        help='длина одного соединения (LIVE_STREAM_SECONDS): поток переоткрывается')
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ['LIVE_POLL_INTERVAL'] = str(args.poll_interval)
+    os.environ['LIVE_STREAM_SECONDS'] = str(args.stream_seconds)
+    app_module = load_app(args.db, args.drop)
+    from models import db
+    from helpers import mark_attendance, insert_attendance_rows
+
+    app = app_module.app
+    from term import academic_term
+
+    day = academic_term.start
+    university, item_id = one_lesson(app_module, args.students, day, dtime(9, 0), dtime(10, 30), 'Лекция')
+    teacher_id, (group, student_ids) = university.teacher_ids[0], next(iter(university.students_by_group.items()))
+    client = login_client(app, teacher_id)
+    with app.app_context():
+        engine = db.engine
+    failures = []
+
+    url = f'/api/teacher/attendance?date={day}&group={quote(group)}'
+    client.get(url)
+    timings, sizes = [], []
+    with QueryCounter(engine) as qc:
+        for _ in range(20):
+            t0 = time.perf_counter()
+            resp = client.get(url)
+            timings.append(time.perf_counter() - t0)
+            sizes.append(len(resp.data))
+    print(f"перезагрузка списка ({args.students} студентов): {percentile(timings, 50) * 1000:.1f} мс, "
+          f"{sizes[0] / 1024:.1f} КБ, {qc.count / 20:.0f} SQL-запросов на обновление")
+
+    scanned = student_ids[:args.scans]
+    direct = student_ids[args.scans:args.scans + args.direct]
+    reader = StreamReader(login_client(app, teacher_id),
+                          f'/api/teacher/attendance/live?item_id={item_id}&date={day}',
+                          len(scanned) + len(direct))
+    reader.start()
+    if not reader.snapshot.wait(10):
+        print("ОШИБКА: снимок не получен")
+        sys.exit(1)
+    snapshot_bytes = reader.bytes
+
+    sent = {}
+    with QueryCounter(engine) as qc:
+        for student_id in scanned:
+            sent[student_id] = time.perf_counter()
+            with app.app_context():
+                mark_attendance(student_id, item_id, day)
+            time.sleep(0.002)
+        with engine.begin() as conn:
+            insert_attendance_rows(conn, [{'student_id': s, 'schedule_item_id': item_id, 'date': day}
+                                          for s in direct])
+        reader.join(timeout=args.poll_interval * 4 + 10)
+    stream_queries = qc.count - 2 * len(scanned) - 2  # минус вставки (отметка + сводка)
+
+    latencies = [reader.received[s] - sent[s] for s in scanned if s in reader.received]
+    events = len(reader.received)
+    print(f"SSE: снимок {snapshot_bytes / 1024:.1f} КБ, затем {(reader.bytes - snapshot_bytes) / max(events, 1):.0f} "
+          f"байт на отметку; задержка p50 {percentile(latencies, 50) * 1000:.1f} мс, "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} мс; ~{max(stream_queries, 0)} SQL-запросов потока")
+    print(f"через опрос БД: {sum(1 for s in direct if s in reader.received)} из {len(direct)}; "
+          f"соединений: {reader.connections} (переподключение с Last-Event-ID, без снимка)")
+    missing = [s for s in scanned + direct if s not in reader.received]
+    if missing:
+        failures.append(f"не пришли отметки {len(missing)} студентов")
+
+    if not check_buffer(int(env('LIVE_BUFFER_SIZE'))):
+        failures.append("буфер подписки не ограничен")
+    with app.app_context():
+        stats = app_module.attendance_feed.stats()
+    if stats['subscribers']:
+        failures.append(f"после закрытия потоков осталось подписок: {stats['subscribers']}")
+
+    if failures:
+        for failure in failures:
+            print(f"ОШИБКА: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Вход и аутентификация: логинов в секунду на ядро и запросы к users на запрос.
+
+    python -m bench.logins
+    python -m bench.logins --seconds 3 --methods pbkdf2:sha256 pbkdf2:sha256:600000 scrypt
+
+1. Проверка пароля для нескольких методов хеширования (один поток — одно ядро).
+2. Полный вход через /login при текущей политике PASSWORD_HASH_METHOD.
+3. Пересчёт хеша при входе: пароль по старому методу после входа хранится по новому.
+4. Сколько раз за аутентифицированный запрос читается таблица users
+   (load_user берёт пользователя из кэша user:<id>).
+При ошибке проверки — код выхода 1.
+"""
+import argparse
+import sys
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from bench.common import load_app, add_db_arguments, login_client
+from bench.generate import generate
+
+PASSWORD = 'bench-password'
+
+
+def checks_per_second(method, seconds):
+    password_hash = generate_password_hash(PASSWORD, method=method)
+    count = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        check_password_hash(password_hash, PASSWORD)
+        count += 1
+    return count / (time.perf_counter() - t0)
+
+
+def seed(app_module, students):
+    """Группа студентов с паролем PASSWORD и legacy — с хешем по прежней политике; возвращает имена студентов."""
+    from models import db, User
+
+    university = generate(app_module, teachers=1, groups=1, students=students, items=0, weeks=0,
+                          password=PASSWORD, verbose=False)
+    group, student_ids = next(iter(university.students_by_group.items()))
+    with app_module.app.app_context():
+        usernames = [name for name, in db.session.query(User.username).filter(User.id.in_(student_ids))
+                     .order_by(User.id)]
+        # Пароль, захешированный по прежней политике (werkzeug по умолчанию)
+        db.session.add(User(username='legacy', role='student', group=group,
+                            password_hash=generate_password_hash(PASSWORD, method='pbkdf2:sha256')))
+        db.session.commit()
+    return usernames
+
+
+def login(client, username):
+    return client.post('/login', data={'username': username, 'password': PASSWORD, 'role': 'student'})
+
+
+def count_users_queries(engine):
+    """Слушатель, считающий только запросы к таблице users."""
+    from sqlalchemy import event
+
+    counter = {'count': 0}
+
+    def on_execute(conn, cursor, statement, *args):
+        if 'FROM users' in statement:
+            counter['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=2.0, help='время замера на каждый метод')
+    parser.add_argument('--methods', nargs='+',
+                        default=['pbkdf2:sha256', 'pbkdf2:sha256:600000', 'scrypt'])
+    parser.add_argument('--logins', type=int, default=20, help='входов через /login')
+    parser.add_argument('--requests', type=int, default=20, help='запросов на пользователя в замере users')
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    for method in args.methods:
+        print(f"{method}: {checks_per_second(method, args.seconds):.1f} проверок пароля/с на ядро")
+
+    app_module = load_app(args.db, args.drop)
+    from models import db, User, PASSWORD_HASH_METHOD, password_hash_prefix
+
+    usernames = seed(app_module, args.logins)
+    app = app_module.app
+    failures = []
+
+    t0 = time.perf_counter()
+    for username in usernames:
+        resp = login(app.test_client(), username)
+        if resp.status_code != 302:
+            failures.append(f"вход {username}: статус {resp.status_code}")
+    elapsed = time.perf_counter() - t0
+    print(f"/login при политике {PASSWORD_HASH_METHOD}: "
+          f"{args.logins / elapsed:.1f} входов/с ({elapsed / args.logins * 1000:.0f} мс на вход)")
+
+    with app.app_context():
+        before = User.query.filter_by(username='legacy').one().password_hash.split('$', 1)[0]
+    resp = login(app.test_client(), 'legacy')
+    with app.app_context():
+        after = User.query.filter_by(username='legacy').one().password_hash.split('$', 1)[0]
+        policy = password_hash_prefix()
+    print(f"пересчёт при входе: {before} -> {after}")
+    if resp.status_code != 302 or after != policy:
+        failures.append(f"хеш не пересчитан: {after}, ожидался {policy}")
+    if login(app.test_client(), 'legacy').status_code != 302:
+        failures.append("после пересчёта не удаётся войти")
+
+    with app.app_context():
+        student_ids = [row.id for row in db.session.query(User.id).filter(User.username.like('student-%'))]
+        engine = db.engine
+    counter = count_users_queries(engine)
+    total = 0
+    for student_id in student_ids:
+        client = login_client(app, student_id)
+        for _ in range(args.requests):
+            resp = client.get('/api/attendance')
+            if resp.status_code != 200:
+                failures.append(f"/api/attendance: статус {resp.status_code}")
+                break
+            total += 1
+    print(f"запросов к users: {counter['count']} на {total} аутентифицированных запросов "
+          f"({counter['count'] / max(total, 1):.2f} на запрос; без кэша было бы 1.00)")
+    if counter['count'] > len(student_ids):
+        failures.append("load_user читает users чаще, чем раз на пользователя")
+
+    if failures:
+        for failure in failures:
+            print(f"ОШИБКА: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
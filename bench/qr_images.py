@@ -0,0 +1,41 @@
+"""Пропускная способность /qr-image: отрисовка каждый раз, кэш, 304 и SVG.
+
+    python -m bench.qr_images
+    QR_VERSION=7 QR_MASK_PATTERN=0 python -m bench.qr_images
+"""
+import time
+from datetime import date
+
+from bench.common import load_app
+
+DURATION = 2.0
+
+
+def measure(title, make_request):
+    count = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < DURATION:
+        resp = make_request(count)
+        assert resp.status_code in (200, 304), resp.status_code
+        count += 1
+    elapsed = time.perf_counter() - t0
+    print(f"{title}: {count / elapsed:.0f} изображений/с")
+
+
+def main():
+    app_module = load_app()
+    client = app_module.app.test_client()
+    today = date.today().isoformat()
+    token = app_module.serializer.dumps(f"1:{today}")
+    url = f'/qr-image/1/{today}/{token}'
+
+    # Уникальный токен на каждый запрос — кэш не помогает, как было до кэширования
+    measure('PNG, без кэша', lambda i: client.get(f'/qr-image/1/{today}/{token}{i}'))
+    measure('SVG, без кэша', lambda i: client.get(f'/qr-image/1/{today}/{token}{i}?format=svg'))
+    measure('PNG, из кэша', lambda i: client.get(url))
+    etag = client.get(url).headers['ETag']
+    measure('PNG, 304 по ETag', lambda i: client.get(url, headers={'If-None-Match': etag}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Размер ответа и время /api/teacher/schedule: месяц, семестр и потоковая выгрузка за год.
+
+    python -m bench.schedule_window
+"""
+import time
+
+from bench.common import load_app, login_client
+from bench.generate import generate
+
+GROUPS = 8
+ITEMS_PER_GROUP = 5
+REPEAT = 50
+
+
+def measure(client, title, url):
+    # Меряем генерацию, а не кэш: сбрасываем его перед каждым запросом
+    from cache import shared_cache
+
+    total = 0.0
+    for _ in range(REPEAT):
+        shared_cache.clear()
+        t0 = time.perf_counter()
+        resp = client.get(url)
+        body = resp.get_data()
+        total += time.perf_counter() - t0
+    print(f"{title}: {len(body) / 1024:.1f} КБ, {total / REPEAT * 1000:.2f} мс")
+
+
+def main():
+    app_module = load_app()
+    # Один преподаватель ведёт GROUPS × ITEMS_PER_GROUP занятий шаблона
+    university = generate(app_module, teachers=1, groups=GROUPS, students=1, items=ITEMS_PER_GROUP, weeks=0,
+                          verbose=False)
+    client = login_client(app_module.app, university.teacher_ids[0])
+    measure(client, 'неделя', '/api/teacher/schedule?from=2025-10-06&to=2025-10-12')
+    measure(client, 'месяц', '/api/teacher/schedule?from=2025-09-29&to=2025-11-02')
+    measure(client, 'семестр', '/api/teacher/schedule')
+    measure(client, 'год, поток', '/api/teacher/schedule?from=2025-09-01&to=2026-08-31&stream=1')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Старт воркера: время импорта app.py, RSS процесса и что при этом загружено.
+
+    python -m bench.startup
+    python -m bench.startup --runs 10 --max-import-ms 800 --max-rss-mb 120
+
+Каждый прогон — отдельный процесс с пустой SQLite-БД, как новый воркер gunicorn.
+Проверяется, что тяжёлые библиотеки (qrcode/PIL, openpyxl, pandas/numpy) не
+импортируются при старте, а импорт не создаёт таблиц; при нарушении или
+превышении порогов — код выхода 1.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench.common import ROOT, percentile
+
+HEAVY_MODULES = ('PIL', 'qrcode', 'openpyxl', 'pandas', 'numpy')
+
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import app
+import_seconds = time.perf_counter() - t0
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+from sqlalchemy import inspect
+with app.app.app_context():
+    tables = inspect(app.db.engine).get_table_names()
+rss = rss_mb()
+heavy = [m for m in HEAVY if m in sys.modules]
+
+# Цена отложенных импортов — платит первый запрос, которому они нужны
+t0 = time.perf_counter()
+import helpers
+helpers.render_qr('https://example.com/scan?item_id=1')
+qr_seconds = time.perf_counter() - t0
+t0 = time.perf_counter()
+import export
+export.write_xlsx(iter([('1',) * 7]))
+xlsx_seconds = time.perf_counter() - t0
+
+print(json.dumps({'import_seconds': import_seconds, 'rss_mb': rss, 'heavy': heavy, 'tables': tables,
+                  'first_qr_seconds': qr_seconds, 'first_xlsx_seconds': xlsx_seconds}))
+'''
+
+
+def run_child(python):
+    fd, path = tempfile.mkstemp(prefix='qr-startup-', suffix='.db')
+    os.close(fd)
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+    env.pop('DB_AUTO_CREATE', None)
+    code = f'HEAVY = {HEAVY_MODULES!r}\n' + CHILD
+    try:
+        out = subprocess.run([python, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    finally:
+        os.remove(path)
+    if out.returncode:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bare_rss_mb(python):
+    out = subprocess.run([python, '-c', "print([l for l in open('/proc/self/status') if l.startswith('VmRSS')][0].split()[1])"],
+                         capture_output=True, text=True)
+    return int(out.stdout) / 1024 if out.returncode == 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=None)
+    parser.add_argument('--max-rss-mb', type=float, default=None)
+    args = parser.parse_args()
+
+    results = [run_child(sys.executable) for _ in range(args.runs)]
+    imports = [r['import_seconds'] * 1000 for r in results]
+    rss = [r['rss_mb'] for r in results]
+    import_ms = percentile(imports, 50)
+    rss_mb = percentile(rss, 50)
+    print(f"импорт app.py: медиана {import_ms:.0f} мс (мин {min(imports):.0f}, макс {max(imports):.0f}), "
+          f"RSS {rss_mb:.1f} МБ (голый python {bare_rss_mb(sys.executable):.1f} МБ)")
+    print(f"первый QR {percentile([r['first_qr_seconds'] for r in results], 50) * 1000:.0f} мс, "
+          f"первый xlsx {percentile([r['first_xlsx_seconds'] for r in results], 50) * 1000:.0f} мс "
+          f"(отложенные импорты)")
+
+    failures = []
+    heavy = sorted({m for r in results for m in r['heavy']})
+    if heavy:
+        failures.append(f"при старте импортированы {', '.join(heavy)}")
+    tables = sorted({t for r in results for t in r['tables']})
+    if tables:
+        failures.append(f"импорт создал таблицы: {', '.join(tables)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"импорт {import_ms:.0f} мс > {args.max_import_ms:.0f} мс")
+    if args.max_rss_mb is not None and rss_mb > args.max_rss_mb:
+        failures.append(f"RSS {rss_mb:.1f} МБ > {args.max_rss_mb:.1f} МБ")
+
+    if failures:
+        for failure in failures:
+            print(f"ОШИБКА: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Индекс шаблона расписания в памяти: поиск «занятий на сегодня», перестройка, память.
+
+    python -m bench.timetable_index
+    python -m bench.timetable_index --teachers 300 --groups 400 --items 24
+    python -m bench.timetable_index --cache-url redis://localhost:6379/0
+
+Сравнивает запрос к БД (как раньше в get_todays_lessons) с поиском в индексе,
+показывает время перестройки и размер индекса. Проверяет, что индекс совпадает
+с БД по всем слотам, что изменение занятия видно сразу, и что /teacher и /student
+не ходят в БД за занятиями. Затем запускает второй процесс-воркер с тем же
+кодом и меняет занятия в нём через ORM: с общим кэшем (--cache-url, по умолчанию
+файл SQLite) изменение должно дойти до этого процесса за check_interval, с
+локальным кэшем индекс выключен и изменение видно сразу. При расхождении — код выхода 1.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import time as dtime
+
+from bench.common import load_app, add_db_arguments, login_client, QueryCounter
+from bench.generate import generate
+
+SLOTS = [(dow, parity) for dow in range(1, 7) for parity in (0, 1)]
+
+
+def other_worker(db_url, cache_url, teacher_id, commands, results):
+    """Второй воркер: отдельный процесс с тем же кодом, той же БД и тем же CACHE_URL."""
+    os.environ['DATABASE_URL'] = db_url
+    os.environ['CACHE_URL'] = cache_url
+    import app as app_module
+    from models import db, ScheduleItem
+    from timetable import timetable_index
+
+    with app_module.app.app_context():
+        timetable_index.teacher_lessons(teacher_id, 7, 0)  # индекс построен до изменений
+        results.put(timetable_index.enabled)
+        for command, *params in iter(commands.get, None):
+            if command == 'insert':
+                dow, parity = params
+                item = ScheduleItem(day_of_week=dow, week_parity=parity, start_time=dtime(9, 0),
+                                    end_time=dtime(10, 0), subject='Воскресное', group_name='G-0',
+                                    teacher_id=teacher_id)
+                db.session.add(item)
+                db.session.commit()
+                results.put(item.id)
+            elif command == 'await':
+                results.put(wait_for_subject(timetable_index, db, teacher_id, *params))
+
+
+def wait_for_subject(timetable_index, db, teacher_id, item_id, dow, parity, subject, timeout):
+    """Через сколько секунд индекс этого процесса покажет занятие с таким названием (None — не дождались)."""
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        db.session.rollback()  # как между запросами: без старой транзакции
+        if any(lesson.id == item_id and lesson.subject == subject
+               for lesson in timetable_index.teacher_lessons(teacher_id, dow, parity)):
+            return time.perf_counter() - t0
+        time.sleep(0.02)
+    return None
+
+
+def check_other_worker(app_module, cache_url, teacher_id, parity):
+    """Изменения через ORM в двух процессах: вставка во втором, переименование в этом."""
+    from models import db, ScheduleItem
+    from cache import shared_cache
+    from timetable import timetable_index
+
+    shared_cache.configure(cache_url, local_max_ttl=shared_cache.local_max_ttl)
+    timetable_index.invalidate()
+    ctx = multiprocessing.get_context('spawn')
+    commands, results = ctx.Queue(), ctx.Queue()
+    process = ctx.Process(target=other_worker, daemon=True, args=(
+        app_module.app.config['SQLALCHEMY_DATABASE_URI'], cache_url, teacher_id, commands, results))
+    process.start()
+    failures = []
+    try:
+        with app_module.app.app_context():
+            timetable_index.teacher_lessons(teacher_id, 7, parity)
+            enabled = results.get(timeout=60)
+            mode = 'индекс' if enabled else 'индекс выключен, чтение из БД'
+            # С общим кэшем изменение доходит за check_interval, без индекса — сразу
+            limit = timetable_index.check_interval + 0.5 if enabled else 0.5
+
+            commands.put(('insert', 7, parity))
+            item_id = results.get(timeout=30)
+            elapsed = wait_for_subject(timetable_index, db, teacher_id, item_id, 7, parity, 'Воскресное', limit)
+            print(f"{cache_url} ({mode}): вставка во втором процессе видна здесь через "
+                  f"{'—' if elapsed is None else f'{elapsed:.2f} с'}")
+            if elapsed is None:
+                failures.append(f"{cache_url}: вставка из другого процесса не видна за {limit:.1f} с")
+
+            db.session.get(ScheduleItem, item_id).subject = 'Переименовано рядом'
+            db.session.commit()
+            commands.put(('await', item_id, 7, parity, 'Переименовано рядом', limit))
+            elapsed = results.get(timeout=limit + 30)
+            print(f"{cache_url} ({mode}): переименование здесь видно во втором процессе через "
+                  f"{'—' if elapsed is None else f'{elapsed:.2f} с'}")
+            if elapsed is None:
+                failures.append(f"{cache_url}: переименование не дошло до другого процесса за {limit:.1f} с")
+    finally:
+        commands.put(None)
+        process.join(30)
+        if process.is_alive():
+            process.kill()
+    return failures
+
+
+def per_call(fn, calls):
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - t0) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--teachers', type=int, default=150)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--items', type=int, default=20, help='занятий в шаблоне на группу')
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--cache-url', default=None,
+                        help='общий кэш для двух процессов (по умолчанию — временный файл SQLite)')
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    if args.cache_url is None:
+        fd, path = tempfile.mkstemp(prefix='qr-bench-cache-', suffix='.db')
+        os.close(fd)
+        args.cache_url = f'sqlite:///{path}'
+    os.environ['CACHE_URL'] = args.cache_url
+    app_module = load_app(args.db, args.drop)
+    from models import db, ScheduleItem, User
+    from timetable import timetable_index
+
+    app = app_module.app
+    teacher_ids = generate(app_module, args.teachers, args.groups, students=1, items=args.items, weeks=0).teacher_ids
+    failures = []
+
+    with app.app_context():
+        timetable_index.snapshot()
+        stats = timetable_index.stats()
+        print(f"индекс: {stats['lessons']} занятий, {stats['teacher_slots']} + {stats['group_slots']} слотов, "
+              f"{stats['memory_bytes'] / 1024:.0f} КБ, перестройка {stats['build_seconds'] * 1000:.1f} мс")
+
+        def by_query(teacher_id, dow, parity):
+            return ScheduleItem.query.filter_by(teacher_id=teacher_id, day_of_week=dow, week_parity=parity).all()
+
+        teacher_id, (dow, parity) = teacher_ids[0], SLOTS[0]
+        db_seconds = per_call(lambda: by_query(teacher_id, dow, parity), args.calls // 10)
+        index_seconds = per_call(lambda: timetable_index.teacher_lessons(teacher_id, dow, parity), args.calls)
+        print(f"занятия преподавателя на день: БД {db_seconds * 1e6:.0f} мкс, "
+              f"индекс {index_seconds * 1e6:.2f} мкс ({db_seconds / index_seconds:.0f}×)")
+
+        mismatched = 0
+        for teacher_id in teacher_ids:
+            for dow, parity in SLOTS:
+                expected = sorted(item.id for item in by_query(teacher_id, dow, parity))
+                if sorted(lesson.id for lesson in timetable_index.teacher_lessons(teacher_id, dow, parity)) != expected:
+                    mismatched += 1
+        if mismatched:
+            failures.append(f"индекс расходится с БД в {mismatched} слотах")
+
+        # Изменение в этом процессе — видно сразу
+        item = ScheduleItem.query.filter_by(teacher_id=teacher_ids[0]).first()
+        item.subject = 'Переименовано'
+        db.session.commit()
+        found = [lesson for lesson in timetable_index.teacher_lessons(item.teacher_id, item.day_of_week,
+                                                                      item.week_parity) if lesson.id == item.id]
+        if not found or found[0].subject != 'Переименовано':
+            failures.append("изменение занятия не попало в индекс")
+
+        student_id = db.session.query(User.id).filter_by(role='student').first().id
+
+    for url, user_id in (('/teacher', teacher_ids[0]), ('/student', student_id)):
+        client = login_client(app, user_id)
+        client.get(url)
+        with app.app_context(), QueryCounter(db.engine) as qc:
+            resp = client.get(url)
+        print(f"{url}: статус {resp.status_code}, SQL-запросов {qc.count}")
+        if resp.status_code != 200 or qc.count:
+            failures.append(f"{url}: статус {resp.status_code}, запросов {qc.count}")
+
+    for parity, cache_url in enumerate((args.cache_url, 'local')):
+        failures += check_other_worker(app_module, cache_url, teacher_ids[0], parity)
+
+    if failures:
+        for failure in failures:
+            print(f"ОШИБКА: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
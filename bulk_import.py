@@ -0,0 +1,381 @@
+import contextlib
+import csv
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dtime
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from models import db, User, ScheduleItem, PASSWORD_HASH_METHOD
+from helpers import invalidate_on_commit, schedule_generation_key
+from export import iter_csv
+from timetable import TIMETABLE_VERSION_KEY
+
+# Массовый импорт в начале семестра: списки пользователей и шаблон расписания из CSV/xlsx.
+# Файл читается построчно и проверяется на лету; корректные строки копятся пачками
+# по batch_size, каждая пачка — одна проверка конфликтов в БД и одна транзакция.
+# Пароли хешируются в пуле процессов: это самая дорогая часть импорта.
+#
+# Колонки списка:     username, password, role (student/teacher, по умолчанию student), group
+# Колонки расписания: day_of_week, week_parity, start_time, end_time, subject, group_name,
+#                     room, teacher (логин; не нужен, если преподаватель задан при импорте)
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_PROBLEMS = 1000
+REPORT_COLUMNS = ('Строка', 'Тип', 'Сообщение')
+REQUIRED_COLUMNS = {
+    'roster': ('username', 'password'),
+    'timetable': ('day_of_week', 'week_parity', 'start_time', 'end_time', 'subject', 'group_name'),
+}
+
+
+class ImportFormatError(ValueError):
+    """Файл не удаётся прочитать как таблицу: формат, пустой файл, нет нужных колонок."""
+
+
+class ImportReport:
+    """Счётчики импорта и первые MAX_REPORTED_PROBLEMS ошибок и конфликтов."""
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.conflicts = 0
+        self.errors = 0
+        self.problems = []  # (строка файла, 'error' | 'conflict', сообщение)
+        self._started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def problem(self, line, kind, message):
+        if kind == 'conflict':
+            self.conflicts += 1
+        else:
+            self.errors += 1
+        if len(self.problems) < MAX_REPORTED_PROBLEMS:
+            self.problems.append((line, kind, message))
+
+    def tick(self):
+        self.elapsed = time.perf_counter() - self._started
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'inserted': self.inserted,
+            'conflicts': self.conflicts,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 2),
+            'rows_per_second': round(self.read / self.elapsed, 1) if self.elapsed else 0,
+        }
+
+
+# === Чтение файла ===
+
+def _cell(value):
+    # xlsx отдаёт числа: группа 101 не должна превратиться в «101.0»
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return value
+
+
+def _iter_csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(text, dialect)
+
+
+def _iter_xlsx_rows(stream):
+    from openpyxl import load_workbook  # тяжёлый импорт — только когда импорт действительно нужен
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield [_cell(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_table(stream, filename, required_columns=()):
+    """(номер строки, {колонка: значение}) из CSV или xlsx; пустые строки пропускаются."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        rows = _iter_csv_rows(stream)
+    elif extension == '.xlsx':
+        rows = _iter_xlsx_rows(stream)
+    else:
+        raise ImportFormatError("Поддерживаются только файлы .csv и .xlsx")
+
+    try:
+        header = next(rows, None)
+    except (UnicodeDecodeError, ValueError, KeyError) as e:
+        raise ImportFormatError(f"Не удалось прочитать файл: {e}") from e
+    if header is None:
+        raise ImportFormatError("Файл пуст")
+    columns = [str(name).strip().lower() if name is not None else '' for name in header]
+    missing = [name for name in required_columns if name not in columns]
+    if missing:
+        raise ImportFormatError(f"Нет колонок: {', '.join(missing)}")
+
+    for line, values in enumerate(rows, 2):
+        if all(value is None or str(value).strip() == '' for value in values):
+            continue
+        yield line, dict(zip(columns, values))
+
+
+# === Проверка строк ===
+
+def _text(row, column, max_length, required=True):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"Поле {column} обязательно")
+    if len(value) > max_length:
+        raise ValueError(f"Поле {column} длиннее {max_length} символов")
+    return value or None
+
+
+def _choice(row, column, choices):
+    try:
+        value = int(str(row.get(column, '')).strip())
+    except ValueError:
+        value = None
+    if value not in choices:
+        raise ValueError(f"Поле {column}: ожидается одно из {', '.join(map(str, choices))}")
+    return value
+
+
+def _time(row, column):
+    value = row.get(column)
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, dtime):
+        return value
+    value = '' if value is None else str(value).strip()
+    for fmt in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f"Поле {column}: неверное время «{value}» (ЧЧ:ММ)")
+
+
+def parse_roster_row(row):
+    role = (_text(row, 'role', 20, required=False) or 'student').lower()
+    if role not in ('student', 'teacher'):
+        raise ValueError(f"Неизвестная роль «{role}»")
+    user = {
+        'username': _text(row, 'username', 80),
+        'password': _text(row, 'password', 255),
+        'role': role,
+        'group': _text(row, 'group', 50, required=False) if role == 'student' else None,
+    }
+    if role == 'student' and not user['group']:
+        raise ValueError("Студенты должны указать группу")
+    return user
+
+
+def parse_timetable_row(row, need_teacher=True):
+    item = {
+        'day_of_week': _choice(row, 'day_of_week', range(1, 8)),
+        'week_parity': _choice(row, 'week_parity', (0, 1)),
+        'start_time': _time(row, 'start_time'),
+        'end_time': _time(row, 'end_time'),
+        'subject': _text(row, 'subject', 150),
+        'group_name': _text(row, 'group_name', 20),
+        'room': _text(row, 'room', 20, required=False),
+    }
+    if item['end_time'] <= item['start_time']:
+        raise ValueError("Занятие заканчивается раньше, чем начинается")
+    if need_teacher:
+        item['teacher'] = _text(row, 'teacher', 80)
+    return item
+
+
+# === Импорт ===
+
+@contextlib.contextmanager
+def password_hasher(workers):
+    """Функция «список паролей -> список хешей»; при workers > 1 — в пуле процессов."""
+    method = PASSWORD_HASH_METHOD
+    if workers <= 1:
+        yield lambda passwords: [generate_password_hash(password, method=method) for password in passwords]
+        return
+    # spawn, а не fork: воркер многопоточный (очередь сканов, фоновые задачи),
+    # а fork многопоточного процесса может унести в дочерний захваченные блокировки
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        def hash_all(passwords):
+            chunksize = max(1, len(passwords) // (workers * 4))
+            return list(pool.map(generate_password_hash, passwords, itertools.repeat(method),
+                                 chunksize=chunksize))
+        yield hash_all
+
+
+def _batched(rows, report, parse, batch_size):
+    """Разбирает строки, отсеивая ошибки, и отдаёт пачки [(строка, запись)]."""
+    batch = []
+    for line, row in rows:
+        report.read += 1
+        try:
+            batch.append((line, parse(row)))
+        except ValueError as e:
+            report.problem(line, 'error', str(e))
+            continue
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(table, records, report, invalidate=()):
+    """Вставляет пачку одной транзакцией; при гонке с параллельной записью — по одной.
+
+    invalidate — ключи кэша, которые надо сбросить после записи (вставка идёт в обход ORM).
+    """
+    if not records:
+        return
+    try:
+        invalidate_on_commit(db.session, *invalidate)
+        db.session.execute(table.insert(), [record for _, record in records])
+        db.session.commit()
+        report.inserted += len(records)
+        return
+    except IntegrityError:
+        db.session.rollback()
+    for line, record in records:
+        try:
+            invalidate_on_commit(db.session, *invalidate)
+            db.session.execute(table.insert(), [record])
+            db.session.commit()
+            report.inserted += 1
+        except IntegrityError:
+            db.session.rollback()
+            report.problem(line, 'conflict', "Запись уже существует")
+
+
+def import_roster(rows, batch_size=IMPORT_BATCH_SIZE, workers=1, progress=None):
+    """Импортирует пользователей из iter_table(...); существующие логины — конфликты."""
+    report = ImportReport()
+    seen = set()
+    with password_hasher(workers) as hash_passwords:
+        for batch in _batched(rows, report, parse_roster_row, batch_size):
+            names = [user['username'] for _, user in batch]
+            existing = set(db.session.scalars(select(User.username).where(User.username.in_(names))))
+            fresh = []
+            for line, user in batch:
+                if user['username'] in existing:
+                    report.problem(line, 'conflict', f"Логин «{user['username']}» уже занят")
+                elif user['username'] in seen:
+                    report.problem(line, 'conflict', f"Логин «{user['username']}» повторяется в файле")
+                else:
+                    seen.add(user['username'])
+                    fresh.append((line, user))
+
+            hashes = hash_passwords([user.pop('password') for _, user in fresh])
+            for (_, user), password_hash in zip(fresh, hashes):
+                user['password_hash'] = password_hash
+            _insert(User.__table__, fresh, report)
+            report.tick()
+            if progress:
+                progress(report)
+    report.tick()
+    return report
+
+
+def _slot(item):
+    return item['group_name'], item['day_of_week'], item['week_parity'], item['start_time']
+
+
+def import_timetable(rows, teacher_id=None, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Импортирует занятия шаблона; у группы не может быть двух занятий в одно время.
+
+    teacher_id — все занятия этого преподавателя; иначе — по колонке teacher (логин).
+    """
+    report = ImportReport()
+    seen = set()
+    teacher_ids = {}
+    parse = functools.partial(parse_timetable_row, need_teacher=teacher_id is None)
+    for batch in _batched(rows, report, parse, batch_size):
+        if teacher_id is None:
+            names = {item['teacher'] for _, item in batch} - teacher_ids.keys()
+            if names:
+                teacher_ids.update(db.session.execute(
+                    select(User.username, User.id).where(User.username.in_(names), User.role == 'teacher')
+                ).all())
+
+        existing = {tuple(row) for row in db.session.execute(
+            select(ScheduleItem.group_name, ScheduleItem.day_of_week, ScheduleItem.week_parity,
+                   ScheduleItem.start_time).where(
+                tuple_(ScheduleItem.group_name, ScheduleItem.day_of_week, ScheduleItem.week_parity)
+                .in_({_slot(item)[:3] for _, item in batch}))
+        )}
+
+        fresh = []
+        for line, item in batch:
+            if teacher_id is None:
+                item['teacher_id'] = teacher_ids.get(item.pop('teacher'))
+                if item['teacher_id'] is None:
+                    report.problem(line, 'error', "Преподаватель не найден")
+                    continue
+            else:
+                item['teacher_id'] = teacher_id
+            slot = _slot(item)
+            if slot in existing or slot in seen:
+                report.problem(line, 'conflict',
+                               f"У группы {item['group_name']} уже есть занятие в это время")
+                continue
+            seen.add(slot)
+            fresh.append((line, item))
+
+        _insert(ScheduleItem.__table__, fresh, report,
+                invalidate={TIMETABLE_VERSION_KEY} | {schedule_generation_key(item['teacher_id']) for _, item in fresh})
+        report.tick()
+        if progress:
+            progress(report)
+    report.tick()
+    return report
+
+
+def iter_report_rows(report):
+    kinds = {'error': 'Ошибка', 'conflict': 'Конфликт'}
+    for line, kind, message in sorted(report.problems):
+        yield line, kinds[kind], message
+
+
+def check_import_file(path, filename, table):
+    """Читает только заголовок: ImportFormatError до постановки задачи, а не в ней."""
+    with open(path, 'rb') as stream:
+        next(iter_table(stream, filename, REQUIRED_COLUMNS[table]), None)
+
+
+def run_import(table, path, filename, teacher_id=None, batch_size=IMPORT_BATCH_SIZE, workers=1, progress=None):
+    """Импорт файла: table — 'roster' или 'timetable'."""
+    with open(path, 'rb') as stream:
+        rows = iter_table(stream, filename, REQUIRED_COLUMNS[table])
+        if table == 'roster':
+            return import_roster(rows, batch_size, workers, progress)
+        return import_timetable(rows, teacher_id, batch_size, progress)
+
+
+def write_import_report(output, table, path, filename, teacher_id=None, workers=1, progress=None):
+    """Фоновая задача импорта загруженного файла: в output — CSV с ошибками и конфликтами."""
+    try:
+        report = run_import(table, path, filename, teacher_id, workers=workers,
+                            progress=progress and (lambda report: progress(report.as_dict())))
+    finally:
+        os.remove(path)
+    if progress:
+        progress(report.as_dict())
+    for chunk in iter_csv(iter_report_rows(report), columns=REPORT_COLUMNS):
+        output.write(chunk.encode('utf-8'))
+    return f"Импорт_{table}_отчёт.csv", 'text/csv; charset=utf-8'
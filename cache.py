@@ -0,0 +1,171 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Небольшой потокобезопасный LRU-кэш в памяти процесса
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at или None, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Общий для процессов кэш в файле SQLite — для нескольких воркеров на одной машине
+class SQLiteCache:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)'
+        )
+
+    def _conn(self):
+        # Соединение на поток и на процесс (после fork старое использовать нельзя)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        row = self._conn().execute('SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self._conn().execute('DELETE FROM cache WHERE key = ? AND expires_at <= ?', (key, time.time()))
+            return default
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        self._conn().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value), expires_at)
+        )
+
+    def delete(self, *keys):
+        if keys:
+            self._conn().execute(
+                f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(keys))})", keys
+            )
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+
+
+# Redis (или совместимый сервер) — для нескольких машин за балансировщиком
+class RedisCache:
+    def __init__(self, url, prefix='qr-attendance:'):
+        import redis  # необязательная зависимость, нужна только для этого бэкенда
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        value = self._client.get(self.prefix + key)
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + '*'):
+            self._client.delete(key)
+
+
+def make_cache(url=None, maxsize=4096):
+    """Бэкенд по CACHE_URL: local (по умолчанию), sqlite:///путь или redis://хост:порт/0."""
+    if not url or url == 'local':
+        return LRUCache(maxsize=maxsize)
+    if url.startswith('sqlite:///'):
+        return SQLiteCache(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url)
+    raise ValueError(f"Неизвестный CACHE_URL: {url}")
+
+
+class SharedCache:
+    """Точка доступа к кэшу приложения; бэкенд выбирается при старте через configure()."""
+
+    def __init__(self):
+        self.backend = LRUCache(maxsize=4096)
+        self.local_max_ttl = 5.0
+
+    def configure(self, url=None, maxsize=4096, local_max_ttl=5.0):
+        self.backend = make_cache(url, maxsize)
+        self.local_max_ttl = local_max_ttl
+
+    @property
+    def is_shared(self):
+        """Видят ли другие процессы те же записи (и те же сбросы после коммита)."""
+        return not isinstance(self.backend, LRUCache)
+
+    def data_ttl(self, ttl):
+        """TTL для копии строк из БД.
+
+        Сброс после коммита доходит только до кэша своего процесса, так что с
+        локальным бэкендом остальные воркеры увидят изменение лишь по истечении
+        записи — поэтому там TTL не больше local_max_ttl секунд.
+        """
+        if self.is_shared:
+            return ttl
+        return min(ttl, self.local_max_ttl) if ttl else self.local_max_ttl
+
+    def get(self, key, default=None):
+        return self.backend.get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+
+# Сессии занятий, справочные данные и т. п. — всё, что должно быть согласовано между воркерами
+shared_cache = SharedCache()
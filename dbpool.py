@@ -0,0 +1,102 @@
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from settings import env
+
+
+# QueuePool, который считает, сколько запросы ждали свободного соединения.
+# Пока стоит очередь за соединениями, растёт wait_seconds_total и max_wait_seconds —
+# сигнал, что пул мал для текущей нагрузки.
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts_total = 0
+        self.timeouts_total = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        # QueuePool._do_get рекурсивен — меряем только внешний вызов
+        if getattr(self._local, 'inside', False):
+            return super()._do_get()
+        self._local.inside = True
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts_total += 1
+            raise
+        finally:
+            self._local.inside = False
+            waited = time.perf_counter() - t0
+            with self._stats_lock:
+                self.checkouts_total += 1
+                self.wait_seconds_total += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def recreate(self):
+        # Пул пересоздаётся при сбросе соединений — статистику переносим
+        pool = super().recreate()
+        pool.checkouts_total = self.checkouts_total
+        pool.timeouts_total = self.timeouts_total
+        pool.wait_seconds_total = self.wait_seconds_total
+        pool.max_wait_seconds = self.max_wait_seconds
+        return pool
+
+
+def _env_int(name):
+    return int(env(name))
+
+
+def engine_options_from_env(uri):
+    """Параметры движка для SQLALCHEMY_ENGINE_OPTIONS из DB_POOL_* переменных окружения.
+
+    DB_POOL_SIZE (10), DB_MAX_OVERFLOW (20), DB_POOL_TIMEOUT (10 с),
+    DB_POOL_RECYCLE (1800 с, -1 — не пересоздавать), DB_POOL_PRE_PING (1).
+    """
+    options = {'pool_pre_ping': env('DB_POOL_PRE_PING') == '1'}
+    url = make_url(uri)
+    # SQLite в памяти живёт в одном соединении (StaticPool) — пул не настраиваем
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=_env_int('DB_POOL_SIZE'),
+        max_overflow=_env_int('DB_MAX_OVERFLOW'),
+        pool_timeout=_env_int('DB_POOL_TIMEOUT'),
+        pool_recycle=_env_int('DB_POOL_RECYCLE'),
+    )
+    return options
+
+
+def pool_stats(engine):
+    """Текущее состояние пула соединений для /api/metrics."""
+    pool = engine.pool
+    stats = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            stats.update(
+                checkouts_total=pool.checkouts_total,
+                timeouts_total=pool.timeouts_total,
+                wait_seconds_total=round(pool.wait_seconds_total, 6),
+                avg_wait_seconds=round(pool.wait_seconds_total / pool.checkouts_total, 6)
+                if pool.checkouts_total else 0,
+                max_wait_seconds=round(pool.max_wait_seconds, 6),
+            )
+    return stats
@@ -0,0 +1,149 @@
+import csv
+import io
+import itertools
+import tempfile
+from urllib.parse import quote
+
+from sqlalchemy import select
+
+from models import db, User, ScheduleItem, Attendance
+from helpers import iter_schedule_occurrences
+
+# Выгрузка посещаемости за отрезок дат: строки идут генератором прямо из БД
+# в CSV или в xlsx (write-only), поэтому память не растёт с числом строк.
+
+EXPORT_COLUMNS = ('Группа', 'Предмет', 'Время', 'Студент', 'Статус', 'Дата', 'Время отметки')
+# Ширины колонок xlsx задаются заранее: в write-only режиме ячейки после записи не перечитать
+EXPORT_WIDTHS = (12, 30, 19, 25, 14, 12, 15)
+MARKS_BATCH = 5000
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def iter_attendance_rows(teacher_id, start_date, end_date, group=None):
+    """Строки выгрузки (в порядке EXPORT_COLUMNS) за каждое занятие каждого дня отрезка.
+
+    Шаблон и списки групп читаются один раз, отметки — одним потоковым запросом,
+    упорядоченным по дате: в памяти держатся только отметки текущего дня.
+    """
+    query = ScheduleItem.query.filter_by(teacher_id=teacher_id)
+    if group:
+        query = query.filter_by(group_name=group)
+    template = query.order_by(ScheduleItem.start_time, ScheduleItem.group_name, ScheduleItem.id).all()
+    if not template:
+        return
+
+    students_by_group = {}
+    for student_id, username, group_name in db.session.query(User.id, User.username, User.group).filter(
+        User.role == 'student',
+        User.group.in_({lesson.group_name for lesson in template})
+    ).order_by(User.id):
+        students_by_group.setdefault(group_name, []).append((student_id, username))
+
+    marks_query = select(
+        Attendance.date, Attendance.schedule_item_id, Attendance.student_id, Attendance.scanned_at
+    ).join(ScheduleItem, ScheduleItem.id == Attendance.schedule_item_id).where(
+        ScheduleItem.teacher_id == teacher_id,
+        Attendance.date.between(start_date, end_date)
+    ).order_by(Attendance.date)
+    if group:
+        marks_query = marks_query.where(ScheduleItem.group_name == group)
+    result = db.session.execute(marks_query.execution_options(yield_per=MARKS_BATCH))
+
+    try:
+        marks = iter(result)
+        pending = next(marks, None)
+        current_day, day_marks = None, {}
+        for day, _, lesson in iter_schedule_occurrences(template, start_date, end_date):
+            if day != current_day:
+                # Отметки идут по дате — дочитываем поток до текущего дня
+                current_day, day_marks = day, {}
+                while pending is not None and pending.date <= day:
+                    if pending.date == day:
+                        day_marks[(pending.schedule_item_id, pending.student_id)] = pending.scanned_at
+                    pending = next(marks, None)
+                date_str = day.isoformat()
+
+            time_str = f"{lesson.start_time}–{lesson.end_time}"
+            for student_id, username in students_by_group.get(lesson.group_name, ()):
+                scanned_at = day_marks.get((lesson.id, student_id))
+                yield (
+                    lesson.group_name,
+                    lesson.subject,
+                    time_str,
+                    username,
+                    'Присутствует' if scanned_at else 'Отсутствует',
+                    date_str,
+                    scanned_at.strftime('%H:%M:%S') if scanned_at else '',
+                )
+    finally:
+        result.close()
+
+
+def export_period(start_date, end_date):
+    return str(start_date) if start_date == end_date else f"{start_date}_{end_date}"
+
+
+def export_filename(group, start_date, end_date, fmt):
+    return f"Посещаемость_{group or 'все'}_{export_period(start_date, end_date)}.{fmt}"
+
+
+def export_rows(teacher_id, start_date, end_date, group=None):
+    """iter_attendance_rows, а если строк нет — одна строка «Нет данных»."""
+    rows = iter_attendance_rows(teacher_id, start_date, end_date, group)
+    first = next(rows, None)
+    if first is None:
+        return iter([(group or '', '', '', 'Нет данных', '', export_period(start_date, end_date), '')])
+    return itertools.chain([first], rows)
+
+
+def iter_csv(rows, columns=EXPORT_COLUMNS, chunk_rows=500):
+    """CSV кусками по chunk_rows строк; BOM — чтобы Excel узнал UTF-8."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('﻿')
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(rows, columns=EXPORT_COLUMNS, widths=EXPORT_WIDTHS, sheet_title='Посещаемость', output=None):
+    """Пишет строки в xlsx (write-only) и возвращает файл, открытый на чтение с начала.
+
+    Без output небольшие книги остаются в памяти, большие уходят во временный файл.
+    """
+    from openpyxl import Workbook  # тяжёлый импорт — только когда выгрузка действительно нужна
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    for index, width in enumerate(widths):
+        sheet.column_dimensions[chr(ord('A') + index)].width = width
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def write_attendance_export(output, teacher_id, start_date, end_date, group=None, fmt='xlsx'):
+    """Фоновая задача выгрузки: пишет файл в output, возвращает (имя файла, MIME-тип)."""
+    rows = export_rows(teacher_id, start_date, end_date, group)
+    if fmt == 'csv':
+        for chunk in iter_csv(rows):
+            output.write(chunk.encode('utf-8'))
+        return export_filename(group, start_date, end_date, 'csv'), 'text/csv; charset=utf-8'
+    write_xlsx(rows, output=output)
+    return export_filename(group, start_date, end_date, 'xlsx'), XLSX_MIMETYPE
+
+
+def attachment_header(filename):
+    """Content-Disposition с именем файла в UTF-8 (RFC 5987)."""
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
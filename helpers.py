@@ -1,53 +1,385 @@
-from datetime import datetime, timedelta
-from models import ScheduleItem, db
+from datetime import datetime
+import secrets
+import hashlib
+import heapq
+from io import BytesIO
+from flask import json
+from flask_login import UserMixin
+from sqlalchemy.exc import IntegrityError
+from models import User, ScheduleItem, Attendance, db
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from cache import LRUCache, shared_cache
+from summary import record_inserted
+from live import attendance_feed
+from timetable import timetable_index, TIMETABLE_VERSION_KEY
+from term import academic_term
 
-# Генерация расписания на семестр 
+def _every_two_weeks(lesson, index, start_date, end_date):
+    for day in academic_term.iter_lesson_dates(lesson.day_of_week, lesson.week_parity, start_date, end_date):
+        yield day, index, lesson
+
+def iter_schedule_occurrences(template, start_date, end_date):
+    """Занятия шаблона на отрезке дат по порядку: (дата, номер недели, занятие).
+
+    Для каждого занятия сразу переходим к первой подходящей дате и шагаем
+    по две недели — работа пропорциональна числу занятий в окне, а не числу дней.
+    Праздники семестра пропускаются.
+    """
+    sequences = [_every_two_weeks(lesson, index, start_date, end_date)
+                 for index, lesson in enumerate(template)]
+    for day, _, lesson in heapq.merge(*sequences):
+        yield day, academic_term.week(day)[0], lesson
+
+def _lesson_entry(lesson):
+    # Неизменная часть записи занятия — считаем один раз, а не на каждую дату
+    return {
+        'id': lesson.id,
+        'subject': lesson.subject,
+        'time': f"{lesson.start_time.strftime('%H:%M')}–{lesson.end_time.strftime('%H:%M')}",
+        'group': lesson.group_name,
+        'room': lesson.room or '—',
+    }
+
+def iter_schedule_days(template, start_date, end_date):
+    """Пары (дата ISO, [записи занятий]) по возрастанию даты."""
+    entries = {}
+    current_day, day_entries = None, []
+    for day, week_num, lesson in iter_schedule_occurrences(template, start_date, end_date):
+        if day != current_day:
+            if day_entries:
+                yield current_day.isoformat(), day_entries
+            current_day, day_entries = day, []
+        if lesson.id not in entries:
+            entries[lesson.id] = _lesson_entry(lesson)
+        day_entries.append(dict(
+            entries[lesson.id],
+            week_num=week_num,
+            parity_str='нечётная' if week_num % 2 == 1 else 'чётная'
+        ))
+    if day_entries:
+        yield current_day.isoformat(), day_entries
+
+# Генерация расписания на семестр (или на окно дат)
 def expand_schedule_to_semester(teacher_id, start_date=None, end_date=None):
    
     if start_date is None:
-        start_date = datetime(2025, 9, 1).date()  # 1 сентября
+        start_date = academic_term.start
     if end_date is None:
-        end_date = datetime(2025, 12, 31).date()  # 31 декабря
+        end_date = academic_term.end
 
     # Загружаем шаблон
     template = ScheduleItem.query.filter_by(teacher_id=teacher_id).all()
-    if not template:
-        return {}
-
-    # Группируем по (день_недели, чётность)
-    grouped = {}
-    for item in template:
-        key = (item.day_of_week, item.week_parity)
-        grouped.setdefault(key, []).append(item)
-
-    result = {}
-
-    current = start_date
-    week_num = 1
-
-    while current <= end_date:
-        dow = current.isoweekday()  # Пн=1, ..., Вс=7
-        parity = week_num % 2       # 1=нечёт, 0=чёт
-
-        for lesson in grouped.get((dow, parity), []):
-            date_str = current.isoformat()
-            if date_str not in result:
-                result[date_str] = []
-            result[date_str].append({
-                'id': lesson.id,
-                'subject': lesson.subject,
-                'time': f"{lesson.start_time.strftime('%H:%M')}–{lesson.end_time.strftime('%H:%M')}",
-                'group': lesson.group_name,
-                'room': lesson.room or '—',
-                'week_num': week_num,
-                'parity_str': 'нечётная' if parity == 1 else 'чётная'
-            })
-        current += timedelta(days=1)
-        if current.weekday() == 0 and current != start_date:
-            week_num += 1
-
-    return result
+    return dict(iter_schedule_days(template, start_date, end_date))
+
+def iter_schedule_json(template, start_date, end_date):
+    """Тот же JSON, что у expand_schedule_to_semester, но кусками по дню — для больших выгрузок."""
+    yield '{'
+    first = True
+    for date_str, lessons in iter_schedule_days(template, start_date, end_date):
+        yield ('' if first else ',') + json.dumps(date_str) + ':' + json.dumps(lessons)
+        first = False
+    yield '}'
+
+# Развёрнутое расписание преподавателя держим готовым JSON, отдельной записью на окно дат:
+# schedule:<teacher_id>:<поколение>:<from>:<to> -> (etag, body) — запрос недели читает
+# и пишет только свою неделю, а не все окна преподавателя разом.
+# Поколение лежит в schedule:<teacher_id> и сбрасывается при изменении занятий этого
+# преподавателя (см. _schedule_item_changed); окна старого поколения просто истекают.
+# Поколение читаем до запроса к БД: расписание, прочитанное до чужого коммита,
+# ляжет под старое поколение, которое уже никто не спросит.
+SCHEDULE_CACHE_TTL = 24 * 3600
+
+def schedule_generation_key(teacher_id):
+    return f'schedule:{teacher_id}'
+
+def _schedule_generation(teacher_id):
+    key = schedule_generation_key(teacher_id)
+    generation = shared_cache.get(key)
+    if generation is None:
+        generation = secrets.token_hex(8)
+        shared_cache.set(key, generation, ttl=shared_cache.data_ttl(SCHEDULE_CACHE_TTL))
+    return generation
+
+def get_teacher_schedule_json(teacher_id, start_date=None, end_date=None):
+    """Возвращает (etag, JSON-байты) расписания на окно дат, из кэша или заново."""
+    start_date = start_date or academic_term.start
+    end_date = end_date or academic_term.end
+    key = f'schedule:{teacher_id}:{_schedule_generation(teacher_id)}:{start_date}:{end_date}'
+    cached = shared_cache.get(key)
+    if cached is None:
+        body = json.dumps(expand_schedule_to_semester(teacher_id, start_date, end_date)).encode()
+        cached = (hashlib.sha1(body).hexdigest(), body)
+        shared_cache.set(key, cached, ttl=shared_cache.data_ttl(SCHEDULE_CACHE_TTL))
+    return cached
 
 # === Токены для QR ===
 def generate_token():
-    return secrets.token_urlsafe(16)
\ No newline at end of file
+    return secrets.token_urlsafe(16)
+
+
+# === Списки группы с отметками ===
+def build_roster(lessons, target_date):
+    """Для каждого занятия — студенты его группы и их отметки за дату.
+
+    Возвращает [(lesson, [(student, attendance или None), ...]), ...].
+    Два запроса независимо от числа занятий и размера групп.
+    """
+    if not lessons:
+        return []
+
+    groups = {lesson.group_name for lesson in lessons}
+    students_by_group = {}
+    for student in User.query.filter(
+        User.role == 'student',
+        User.group.in_(groups)
+    ).order_by(User.id):
+        students_by_group.setdefault(student.group, []).append(student)
+
+    marks = {}
+    for att in Attendance.query.filter(
+        Attendance.schedule_item_id.in_([lesson.id for lesson in lessons]),
+        Attendance.date == target_date
+    ):
+        marks[(att.schedule_item_id, att.student_id)] = att
+
+    return [
+        (lesson, [(student, marks.get((lesson.id, student.id)))
+                  for student in students_by_group.get(lesson.group_name, [])])
+        for lesson in lessons
+    ]
+
+
+# === Быстрая отметка посещения ===
+
+# item:<id> -> (group_name, teacher_id, end_time); шаблон меняется редко, а сканов — сотни в минуту.
+# Срок — для общего кэша; в локальном запись живёт не дольше shared_cache.local_max_ttl
+ITEM_CACHE_TTL = 3600
+
+def get_item_info(item_id):
+    """Возвращает (group_name, teacher_id, end_time) занятия или None, если его нет."""
+    info = shared_cache.get(f'item:{item_id}')
+    if info is None:
+        row = db.session.query(
+            ScheduleItem.group_name, ScheduleItem.teacher_id, ScheduleItem.end_time
+        ).filter_by(id=item_id).first()
+        if row is None:
+            return None
+        info = (row.group_name, row.teacher_id, row.end_time)
+        shared_cache.set(f'item:{item_id}', info, ttl=shared_cache.data_ttl(ITEM_CACHE_TTL))
+    return info
+
+
+# group-names:<группа> -> {student_id: username}: живая лента берёт имена на каждом
+# переподключении. Сбрасывается при изменении студента группы; перевод в другую группу
+# старая группа увидит через GROUP_NAMES_CACHE_TTL.
+GROUP_NAMES_CACHE_TTL = 60
+
+def get_group_names(group_name):
+    """Имена студентов группы {student_id: username}."""
+    names = shared_cache.get(f'group-names:{group_name}')
+    if names is None:
+        names = dict(db.session.query(User.id, User.username).filter_by(role='student', group=group_name))
+        shared_cache.set(f'group-names:{group_name}', names, ttl=shared_cache.data_ttl(GROUP_NAMES_CACHE_TTL))
+    return names
+
+
+# user:<id> -> (username, role, group): load_user вызывается на каждом запросе,
+# включая каждый скан, — держим личность в кэше, а не читаем users каждый раз.
+# Сбрасывается при изменении пользователя (см. _user_changed).
+USER_CACHE_TTL = 300
+
+class CachedUser(UserMixin):
+    """current_user без строки из БД: только то, что нужно маршрутам и шаблонам."""
+
+    def __init__(self, id, username, role, group):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.group = group
+
+    def __repr__(self):
+        return f"<CachedUser {self.username} ({self.role})>"
+
+def get_user_info(user_id):
+    """Возвращает (username, role, group) пользователя или None, если его нет."""
+    info = shared_cache.get(f'user:{user_id}')
+    if info is None:
+        row = db.session.query(User.username, User.role, User.group).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        info = (row.username, row.role, row.group)
+        shared_cache.set(f'user:{user_id}', info, ttl=shared_cache.data_ttl(USER_CACHE_TTL))
+    return info
+
+def load_cached_user(user_id):
+    info = get_user_info(user_id)
+    return CachedUser(user_id, *info) if info else None
+
+
+# === Инвалидация кэша при изменении строк ===
+# Ключи копятся в сессии и сбрасываются после коммита, чтобы другой воркер
+# не успел закэшировать ещё не закоммиченное старое значение.
+
+def invalidate_on_commit(session, *keys):
+    session.info.setdefault('invalidate_keys', set()).update(keys)
+
+def publish_on_commit(session, marks):
+    """Отдать отметки [(student_id, item_id, дата, scanned_at)] в живую ленту после коммита."""
+    if marks:
+        session.info.setdefault('live_marks', []).extend(marks)
+
+@event.listens_for(Session, 'after_commit')
+def _drop_invalidated_keys(session):
+    keys = session.info.pop('invalidate_keys', None)
+    if keys:
+        shared_cache.delete(*keys)
+        if TIMETABLE_VERSION_KEY in keys:
+            timetable_index.invalidate()
+    marks = session.info.pop('live_marks', None)
+    if marks:
+        attendance_feed.publish(marks)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_invalidated_keys(session):
+    session.info.pop('invalidate_keys', None)
+    session.info.pop('live_marks', None)
+
+@event.listens_for(ScheduleItem, 'after_insert')
+@event.listens_for(ScheduleItem, 'after_update')
+@event.listens_for(ScheduleItem, 'after_delete')
+def _schedule_item_changed(mapper, connection, target):
+    # Занятие могли передать другому преподавателю — сбрасываем расписание обоих
+    teachers = {target.teacher_id, *inspect(target).attrs.teacher_id.history.deleted}
+    invalidate_on_commit(object_session(target), f'item:{target.id}', f'lecture:{target.id}',
+                         TIMETABLE_VERSION_KEY, *(schedule_generation_key(t) for t in teachers if t))
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    keys = [f'user:{target.id}']
+    if target.group:
+        keys.append(f'group-names:{target.group}')
+    invalidate_on_commit(object_session(target), *keys)
+
+
+def _insert_ignore_stmt(dialect):
+    # INSERT ... ON CONFLICT DO NOTHING по uq_student_item_date
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(Attendance.__table__).on_conflict_do_nothing(
+        index_elements=['student_id', 'schedule_item_id', 'date']
+    )
+
+def _insert_attendance_returning(connection, rows):
+    if not rows:
+        return []
+    now = datetime.utcnow()
+    rows = [dict(row, scanned_at=row.get('scanned_at') or now) for row in rows]
+    table = Attendance.__table__
+
+    stmt = _insert_ignore_stmt(connection.dialect.name)
+    if stmt is not None:
+        inserted = connection.execute(stmt.values(rows).returning(
+            table.c.student_id, table.c.schedule_item_id, table.c.date, table.c.scanned_at
+        )).all()
+    else:
+        # Диалект без ON CONFLICT — по строке в SAVEPOINT
+        inserted = []
+        for row in rows:
+            try:
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(**row))
+                inserted.append((row['student_id'], row['schedule_item_id'], row['date'], row['scanned_at']))
+            except IntegrityError:
+                pass
+
+    record_inserted(connection, inserted)
+    return inserted
+
+def insert_attendance_rows(connection, rows):
+    """Вставляет отметки через соединение connection, пропуская дубликаты.
+
+    То же, что insert_attendance, но без сессии Flask-SQLAlchemy — для
+    асинхронного сервиса (AsyncConnection.run_sync) и фоновых задач.
+    """
+    return len(_insert_attendance_returning(connection, rows))
+
+def insert_attendance(rows):
+    """Вставляет отметки [{student_id, schedule_item_id, date}], пропуская дубликаты.
+
+    Возвращает число реально вставленных строк. Коммит — на вызывающей стороне.
+    Сводка attendance_summary обновляется в той же транзакции, живая лента
+    преподавателя получает отметки после коммита.
+    """
+    inserted = _insert_attendance_returning(db.session.connection(), rows)
+    publish_on_commit(db.session, inserted)
+    return len(inserted)
+
+def mark_attendance(student_id, item_id, attendance_date):
+    """Одна атомарная вставка; False — студент уже отмечен."""
+    inserted = insert_attendance([{
+        'student_id': student_id,
+        'schedule_item_id': item_id,
+        'date': attendance_date,
+    }])
+    db.session.commit()
+    return inserted == 1
+
+
+# === Картинки QR ===
+
+# qrcode (а с ним PIL) импортируется при первой отрисовке, а не при старте воркера
+QR_ERROR_LEVELS = ('L', 'M', 'Q', 'H')
+
+# (формат, scan_url) -> (байты, etag); URL содержит токен, так что картинка по нему неизменна
+_qr_cache = LRUCache(maxsize=256)
+
+def qr_etag(scan_url, fmt, version=None, error_correction='M', mask_pattern=None):
+    key = f"{fmt}:{version}:{error_correction}:{mask_pattern}:{scan_url}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def render_qr(data, fmt='png', version=None, error_correction='M', mask_pattern=None):
+    """Рисует QR-код: PNG или SVG (без растеризации).
+
+    Фиксированная маска избавляет от перебора всех восьми — это самая дорогая часть.
+    """
+    import qrcode
+    import qrcode.image.svg
+    from qrcode.exceptions import DataOverflowError
+
+    level = error_correction if error_correction in QR_ERROR_LEVELS else 'M'
+    qr = qrcode.QRCode(version=version, box_size=10, border=4, mask_pattern=mask_pattern,
+                       error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{level}'))
+    qr.add_data(data)
+    try:
+        # Фиксированная версия экономит подбор размера; если данные не влезли — подбираем
+        qr.make(fit=version is None)
+    except DataOverflowError:
+        qr.version = None
+        qr.make(fit=True)
+
+    buf = BytesIO()
+    if fmt == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buf)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buf, format='PNG')
+    return buf.getvalue()
+
+def get_qr_image(scan_url, fmt='png', version=None, error_correction='M', mask_pattern=None):
+    """Картинка QR из LRU-кэша; возвращает (байты, etag)."""
+    key = (fmt, version, error_correction, mask_pattern, scan_url)
+    cached = _qr_cache.get(key)
+    if cached is None:
+        cached = (render_qr(scan_url, fmt, version, error_correction, mask_pattern),
+                  qr_etag(scan_url, fmt, version, error_correction, mask_pattern))
+        _qr_cache.set(key, cached)
+    return cached
+
+def configure_qr_cache(maxsize):
+    _qr_cache.maxsize = maxsize
@@ -0,0 +1,246 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Attendance
+from helpers import insert_attendance
+
+log = logging.getLogger(__name__)
+
+
+# Отложенная пакетная запись посещений (write-behind).
+# Скан кладёт отметку в очередь и сразу получает ответ, а фоновый поток
+# пишет накопленное одной транзакцией: до batch_size строк или раз в flush_interval секунд.
+# Строки, которые БД не примет никогда (занятие или студент удалены между ответом и
+# записью — FK), не возвращаются в очередь, а уходят в dead_letter_path.
+# Остаток очереди при остановке каждый воркер сбрасывает в свой файл <spill>-<pid>.jsonl;
+# при старте воркер забирает все такие файлы через os.replace — кто первый, того и файл.
+class AttendanceQueue:
+    def __init__(self, app, batch_size=200, flush_interval=0.5, spill_path=None, dead_letter_path=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path or os.path.join(app.instance_path, 'attendance_spill.jsonl')
+        self.dead_letter_path = dead_letter_path or os.path.join(app.instance_path, 'attendance_dead_letter.jsonl')
+
+        self._queue = queue.Queue()
+        self._pending = set()           # ключи, ещё не записанные в БД
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Метрики
+        self.batches_total = 0
+        self.rows_total = 0
+        self.inserted_total = 0
+        self.errors_total = 0
+        self.dead_letter_total = 0
+        self.last_batch_size = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.flush_seconds_total = 0.0
+
+    def _ensure_started(self):
+        # Поток стартует в воркере при первом скане (после fork у gunicorn)
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._replay_spill()
+            self._thread = threading.Thread(target=self._run, name='attendance-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, student_id, item_id, attendance_date):
+        """Ставит отметку в очередь; False — такая отметка уже ждёт записи или есть в БД.
+
+        Вызывается в контексте запроса. Проверка БД — один SELECT по uq_student_item_date;
+        повтор, пришедший в другой воркер до записи пакета, получит 202 и будет
+        молча отброшен ON CONFLICT DO NOTHING.
+        """
+        self._ensure_started()
+        key = (student_id, item_id, attendance_date)
+        with self._lock:
+            if key in self._pending:
+                return False
+        if db.session.query(Attendance.id).filter_by(
+                student_id=student_id, schedule_item_id=item_id, date=attendance_date).first() is not None:
+            return False
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._queue.put(key)
+        return True
+
+    def depth(self):
+        return len(self._pending)
+
+    def _take_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._flush_with_retry(batch)
+
+    def _flush(self, batch):
+        rows = [{'student_id': s, 'schedule_item_id': i, 'date': d} for s, i, d in batch]
+        t0 = time.perf_counter()
+        with self.app.app_context():
+            try:
+                inserted = insert_attendance(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        elapsed = time.perf_counter() - t0
+
+        with self._lock:
+            self._pending.difference_update(batch)
+            self.batches_total += 1
+            self.rows_total += len(batch)
+            self.inserted_total += inserted
+            self.last_batch_size = len(batch)
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.flush_seconds_total += elapsed
+
+    def _flush_rows(self, batch):
+        """Пакет отвергнут целиком из-за отдельных строк — пишем по одной, плохие откладываем.
+
+        Возвращает строки, до которых не дошли из-за сбоя БД (их повторяет _flush_with_retry).
+        """
+        for n, key in enumerate(batch):
+            try:
+                self._flush([key])
+            except IntegrityError as e:
+                self._dead_letter(key, e)
+            except Exception as e:
+                self._count_error()
+                log.warning("Ошибка записи посещений по строке, осталось %d шт.: %s", len(batch) - n, e)
+                return batch[n:]
+        return []
+
+    def _count_error(self):
+        with self._lock:
+            self.errors_total += 1
+
+    def _dead_letter(self, key, error):
+        student_id, item_id, attendance_date = key
+        os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([student_id, item_id, attendance_date.isoformat(), str(error.orig)],
+                               ensure_ascii=False) + '\n')
+        with self._lock:
+            self._pending.discard(key)
+            self.dead_letter_total += 1
+        log.warning("Отметка %s не принята БД, отложена в %s: %s", key, self.dead_letter_path, error.orig)
+
+    def _flush_with_retry(self, batch, attempts=3):
+        for attempt in range(attempts):
+            try:
+                self._flush(batch)
+                return True
+            except IntegrityError as e:
+                # Повтор не поможет: ON CONFLICT DO NOTHING не гасит нарушение FK
+                self._count_error()
+                log.warning("Пакет посещений (%d шт.) отвергнут, пишем по строке: %s", len(batch), e.orig)
+                batch = self._flush_rows(batch)
+                if not batch:
+                    return True
+            except Exception as e:
+                self._count_error()
+                log.warning("Ошибка записи пакета посещений (%d шт.): %s", len(batch), e)
+            time.sleep(0.2 * (attempt + 1))
+        # БД недоступна — возвращаем пакет в очередь, чтобы не потерять
+        for key in batch:
+            self._queue.put(key)
+        return False
+
+    def stop(self):
+        """Корректное завершение: дописывает очередь, остаток сбрасывает на диск."""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        batch = self._drain()
+        while batch:
+            chunk, batch = batch[:self.batch_size], batch[self.batch_size:]
+            if not self._flush_with_retry(chunk, attempts=1):
+                self._spill(chunk + batch + self._drain())
+                return
+
+    def _own_spill_path(self):
+        root, ext = os.path.splitext(self.spill_path)
+        return f'{root}-{os.getpid()}{ext}'
+
+    def _spill(self, batch):
+        path = self._own_spill_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for student_id, item_id, attendance_date in batch:
+                f.write(json.dumps([student_id, item_id, attendance_date.isoformat()]) + '\n')
+        log.warning("Сохранено на диск %d незаписанных отметок: %s", len(batch), path)
+
+    def _replay_spill(self):
+        # Отметки, не записанные при прошлой остановке любого воркера, ставим в очередь заново
+        root, ext = os.path.splitext(self.spill_path)
+        for path in sorted(glob.glob(glob.escape(root) + '*' + ext)):
+            replay_path = f'{path}.replay-{os.getpid()}'
+            try:
+                os.replace(path, replay_path)
+            except FileNotFoundError:
+                continue  # файл уже забрал другой воркер
+            with open(replay_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        student_id, item_id, date_str = json.loads(line)
+                        key = (student_id, item_id, date.fromisoformat(date_str))
+                        self._pending.add(key)
+                        self._queue.put(key)
+            os.remove(replay_path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': len(self._pending),
+                'batches_total': self.batches_total,
+                'rows_total': self.rows_total,
+                'inserted_total': self.inserted_total,
+                'errors_total': self.errors_total,
+                'dead_letter_total': self.dead_letter_total,
+                'last_batch_size': self.last_batch_size,
+                'avg_batch_size': self.rows_total / self.batches_total if self.batches_total else 0,
+                'last_flush_seconds': self.last_flush_seconds,
+                'max_flush_seconds': self.max_flush_seconds,
+                'avg_flush_seconds': self.flush_seconds_total / self.batches_total if self.batches_total else 0,
+            }
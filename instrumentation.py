@@ -0,0 +1,301 @@
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Метрики запросов: гистограммы времени ответа по эндпоинтам, число и время
+# SQL-запросов на запрос (через события SQLAlchemy), профили медленных запросов.
+# Всё считается в памяти процесса; /metrics отдаёт это в текстовом формате Prometheus
+# (при нескольких воркерах Prometheus опрашивает каждый или суммирует по instance).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+METRIC_PREFIX = 'qr_attendance'
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # значения меток -> [счётчики по корзинам, сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, ("le", bound))} {bucket_count}')
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, ("le", "+Inf"))} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {total}')
+                lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+def render_gauges(sections):
+    """{'db_pool': {'checked_out': 3, ...}, ...} -> строки gauge; нечисловые значения пропускаются."""
+    lines = []
+    for section, values in sections.items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f'{METRIC_PREFIX}_{section}_{key}'
+            lines += [f'# TYPE {name} gauge', f'{name} {value}']
+    return lines
+
+
+LOOPBACK_ADDRS = ('127.0.0.1', '::1')
+
+
+def metrics_access_allowed(token=None):
+    """Доступ к /metrics*: с заданным token — по заголовку Authorization: Bearer <token>,
+    без него — только с локального адреса (Prometheus-агент на той же машине)."""
+    if not token:
+        return request.remote_addr in LOOPBACK_ADDRS
+    header = request.headers.get('Authorization', '')
+    scheme, _, value = header.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(value.encode(), token.encode())
+
+
+# Сэмплирующий профилировщик: один фоновый поток раз в interval секунд снимает стеки
+# отслеживаемых потоков. Работает, только пока есть что отслеживать.
+class StackSampler:
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._threads = {}  # thread id -> Counter свёрнутых стеков
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._cond:
+            self._threads[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self, thread_id):
+        with self._cond:
+            return self._threads.pop(thread_id, Counter())
+
+    def _collapse(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._threads:
+                    self._cond.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._cond:
+                for thread_id, stacks in self._threads.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._collapse(frame)] += 1
+
+
+class Instrumentation:
+    """Подключает метрики к Flask-приложению.
+
+    slow_ms — порог медленного запроса; profile_rate — доля запросов, которые
+    сэмплируются (0 — профили выключены). Профили сохраняются только для медленных.
+    """
+
+    def __init__(self, slow_ms=500, profile_rate=0.0, profile_interval=0.005, keep_profiles=20):
+        self.slow_seconds = slow_ms / 1000
+        self.profile_rate = profile_rate
+        self.sampler = StackSampler(profile_interval) if profile_rate > 0 else None
+        self.profiles = deque(maxlen=keep_profiles)
+
+        self.latency = Histogram(f'{METRIC_PREFIX}_request_duration_seconds',
+                                 'Время обработки запроса', ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+        self.queries = Histogram(f'{METRIC_PREFIX}_request_sql_queries',
+                                 'SQL-запросов на HTTP-запрос', ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.sql_seconds = CounterMetric(f'{METRIC_PREFIX}_sql_seconds_total',
+                                         'Суммарное время SQL-запросов', ('endpoint',))
+        self.slow_requests = CounterMetric(f'{METRIC_PREFIX}_slow_requests_total',
+                                           'Запросов дольше порога', ('endpoint',))
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_request(self):
+        g.instr_start = time.perf_counter()
+        g.instr_sql_count = 0
+        g.instr_sql_seconds = 0.0
+        g.instr_sampled = self.sampler is not None and random.random() < self.profile_rate
+        if g.instr_sampled:
+            self.sampler.start(threading.get_ident())
+
+    def _after_request(self, response):
+        start = g.get('instr_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        self.latency.observe((endpoint, request.method, str(response.status_code)), elapsed)
+        self.queries.observe((endpoint,), g.instr_sql_count)
+        self.sql_seconds.inc((endpoint,), g.instr_sql_seconds)
+
+        stacks = self._stop_sampling()
+        if elapsed >= self.slow_seconds:
+            self.slow_requests.inc((endpoint,))
+            if stacks:
+                self.profiles.append({
+                    'at': datetime.now().isoformat(timespec='seconds'),
+                    'endpoint': endpoint,
+                    'method': request.method,
+                    # Шаблон маршрута, а не путь: в пути бывают токены (/qr-image/.../<token>)
+                    'rule': request.url_rule.rule if request.url_rule else None,
+                    'status': response.status_code,
+                    'duration_ms': round(elapsed * 1000, 1),
+                    'sql_count': g.instr_sql_count,
+                    'sql_ms': round(g.instr_sql_seconds * 1000, 1),
+                    'samples': sum(stacks.values()),
+                    'stacks': stacks.most_common(30),
+                })
+        return response
+
+    def _stop_sampling(self):
+        if not g.get('instr_sampled'):
+            return None
+        g.instr_sampled = False
+        return self.sampler.stop(threading.get_ident())
+
+    def _teardown_request(self, exc):
+        # after_request не вызывается при необработанном исключении — поток не должен остаться в сэмплере
+        self._stop_sampling()
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('instr_query_start', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('instr_query_start')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        # Запросы фоновых потоков (очередь сканов, задачи) к HTTP-запросу не относятся
+        if has_request_context() and 'instr_sql_count' in g:
+            g.instr_sql_count += 1
+            g.instr_sql_seconds += elapsed
+
+    def render(self, gauges=None):
+        lines = []
+        for metric in (self.latency, self.queries, self.sql_seconds, self.slow_requests):
+            lines += metric.render()
+        lines += render_gauges(gauges or {})
+        return '\n'.join(lines) + '\n'
+
+
+# === Логирование ===
+
+class RateLimitFilter(logging.Filter):
+    """Не больше burst одинаковых сообщений (по шаблону) за period секунд.
+
+    Лишние отбрасываются, а число отброшенных дописывается к следующему пропущенному.
+    """
+
+    def __init__(self, period=60.0, burst=10):
+        super().__init__()
+        self.period = period
+        self.burst = burst
+        self._state = {}  # (логгер, уровень, шаблон) -> [начало окна, пропущено, отброшено]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.period:
+                suppressed = state[2] if state else 0
+                state = self._state[key] = [now, 0, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} (ещё {suppressed} таких сообщений отброшено)"
+            if state[1] >= self.burst:
+                state[2] += 1
+                return False
+            state[1] += 1
+            return True
+
+
+# Логгеры модулей приложения; корневой логгер и сторонние библиотеки (httpx, sqlalchemy...)
+# setup_logging не трогает
+APP_LOGGERS = ('app', 'asgi_scan', 'ingest', 'jobs')
+
+
+def setup_logging(level='INFO', period=60.0, burst=10, loggers=APP_LOGGERS):
+    """Уровневый лог логгеров приложения в stderr с ограничением частоты; повторный вызов ничего не меняет."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    handler.addFilter(RateLimitFilter(period, burst))
+    for name in loggers:
+        logger = logging.getLogger(name)
+        if any(isinstance(f, RateLimitFilter) for h in logger.handlers for f in h.filters):
+            continue
+        logger.addHandler(handler)
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+        logger.propagate = False  # свой формат и ограничение частоты, без дублей через корневой
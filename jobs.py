@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+_JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class JobLimitError(Exception):
+    """Слишком много задач: в очереди или у одного пользователя."""
+
+
+# Фоновые задачи для тяжёлых выгрузок и отчётов.
+# Запрос ставит задачу и сразу получает её id; задача выполняется в небольшом пуле
+# потоков (он же ограничивает нагрузку на БД и процессор), результат пишется в файл.
+# Результат и описание задачи (<id>.json рядом с файлом) лежат в общей папке, поэтому
+# статус и скачивание работают из любого воркера — и с локальным кэшем приложения.
+class JobRunner:
+    def __init__(self, app, result_dir=None, max_workers=2, max_queued=20,
+                 max_per_owner=2, ttl=3600):
+        self.app = app
+        self.result_dir = result_dir or os.path.join(app.instance_path, 'jobs')
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_per_owner = max_per_owner
+        self.ttl = ttl
+
+        self._handlers = {}
+        self._with_progress = set()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = {}               # owner_id -> задач в очереди и в работе (в этом процессе)
+
+        # Метрики
+        self.submitted_total = 0
+        self.rejected_total = 0
+        self.done_total = 0
+        self.failed_total = 0
+        self.run_seconds_total = 0.0
+
+    def register(self, kind, progress=False):
+        """Декоратор: handler(output, **params) пишет результат в файл и возвращает (имя, MIME-тип).
+
+        progress=True — handler получает ещё progress(dict): он попадает в описание задачи.
+        """
+        def decorator(handler):
+            self._handlers[kind] = handler
+            if progress:
+                self._with_progress.add(kind)
+            return handler
+        return decorator
+
+    def _ensure_executor(self):
+        # Пул создаётся в воркере при первой задаче (после fork у gunicorn)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            os.makedirs(self.result_dir, exist_ok=True)
+
+    def submit(self, kind, owner_id, **params):
+        """Ставит задачу в очередь и возвращает её описание; JobLimitError — если нельзя."""
+        if kind not in self._handlers:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+        with self._lock:
+            queued = sum(self._active.values())
+            if queued >= self.max_queued or self._active.get(owner_id, 0) >= self.max_per_owner:
+                self.rejected_total += 1
+                raise JobLimitError("Слишком много задач, попробуйте позже")
+            self._ensure_executor()
+            self._active[owner_id] = self._active.get(owner_id, 0) + 1
+            self.submitted_total += 1
+
+        try:
+            self.cleanup()
+            job = {
+                'id': uuid.uuid4().hex,
+                'kind': kind,
+                'owner_id': owner_id,
+                'status': 'queued',
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'finished_at': None,
+                'error': None,
+                'filename': None,
+                'mimetype': None,
+                'progress': None,
+            }
+            self._save(job)
+            self._executor.submit(self._run, dict(job), params)
+        except Exception:
+            self._release(owner_id)
+            raise
+        return job
+
+    def get(self, job_id):
+        """Описание задачи или None (нет такой или устарела)."""
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        path = self._state_path(job_id)
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def result_path(self, job):
+        return os.path.join(self.result_dir, job['id'])
+
+    def _state_path(self, job_id):
+        return os.path.join(self.result_dir, job_id + '.json')
+
+    def _save(self, job):
+        # Через временный файл: другой воркер читает либо старое описание, либо новое
+        path = self._state_path(job['id'])
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _progress(self, job, info):
+        job['progress'] = info
+        self._save(job)
+
+    def _release(self, owner_id):
+        with self._lock:
+            self._active[owner_id] -= 1
+            if not self._active[owner_id]:
+                del self._active[owner_id]
+
+    def _run(self, job, params):
+        path = self.result_path(job)
+        t0 = time.perf_counter()
+        try:
+            job['status'] = 'running'
+            self._save(job)
+            if job['kind'] in self._with_progress:
+                params = dict(params, progress=lambda info: self._progress(job, info))
+            with self.app.app_context(), open(path + '.part', 'wb') as output:
+                job['filename'], job['mimetype'] = self._handlers[job['kind']](output, **params)
+            os.replace(path + '.part', path)
+            job['status'] = 'done'
+        except Exception as e:
+            log.exception("Ошибка фоновой задачи %s %s: %s", job['kind'], job['id'], e)
+            job['status'] = 'failed'
+            job['error'] = 'Не удалось выполнить задачу'
+            if os.path.exists(path + '.part'):
+                os.remove(path + '.part')
+        finally:
+            # Слот владельца освобождается при любом исходе, даже если описание не сохранилось
+            elapsed = time.perf_counter() - t0
+            job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            try:
+                self._save(job)
+            except OSError as e:
+                log.exception("Не удалось сохранить состояние задачи %s: %s", job['id'], e)
+            self._release(job['owner_id'])
+            with self._lock:
+                self.run_seconds_total += elapsed
+                if job['status'] == 'done':
+                    self.done_total += 1
+                else:
+                    self.failed_total += 1
+
+    def cleanup(self):
+        """Удаляет результаты и описания задач старше ttl."""
+        if not os.path.isdir(self.result_dir):
+            return
+        deadline = time.time() - self.ttl
+        for name in os.listdir(self.result_dir):
+            path = os.path.join(self.result_dir, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+            except OSError:
+                pass  # файл уже удалил другой воркер
+
+    def stats(self):
+        with self._lock:
+            finished = self.done_total + self.failed_total
+            return {
+                'active': sum(self._active.values()),
+                'max_workers': self.max_workers,
+                'submitted_total': self.submitted_total,
+                'rejected_total': self.rejected_total,
+                'done_total': self.done_total,
+                'failed_total': self.failed_total,
+                'avg_run_seconds': self.run_seconds_total / finished if finished else 0,
+            }
@@ -0,0 +1,213 @@
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, Attendance
+
+# Живая лента отметок для преподавателя (Server-Sent Events).
+# Поток по занятию начинается со снимка списка группы, дальше приходят только новые
+# отметки: стоимость — O(новых сканов), а не O(группы) на каждое обновление.
+# Отметки публикуются при коммите вставки в этом процессе; отметки из других
+# воркеров (и при переполнении буфера) поток дочитывает из БД раз в poll_interval.
+# Соединение живёт несколько секунд и переоткрывается с Last-Event-ID (long-poll):
+# под sync-воркерами gunicorn поток не занимает воркер надолго.
+#
+# Курсор — scanned_at последней учтённой отметки, а не id: id раздаются до коммита,
+# и транзакция с меньшим id может закоммититься позже. Поэтому дочитываем с запасом
+# overlap секунд до курсора; повторы внутри потока отсеиваются здесь, а после
+# переподключения — на клиенте (отметка студента на занятии одна, повтор ничего не меняет).
+
+START = datetime.min  # курсор, пока отметок не было
+
+
+class FeedFullError(Exception):
+    """Слишком много открытых потоков в процессе."""
+
+
+class Subscription:
+    """Буфер событий одного клиента: не больше maxsize, лишнее отбрасывается."""
+
+    def __init__(self, key, maxsize):
+        self.key = key  # (item_id, дата)
+        self.maxsize = maxsize
+        self.overflowed = False
+        self._events = deque()
+        self._cond = threading.Condition()
+
+    def push(self, event):
+        with self._cond:
+            if len(self._events) >= self.maxsize:
+                # Клиент не успевает читать: буфер сбрасываем, поток досчитает отметки из БД
+                self._events.clear()
+                self.overflowed = True
+            else:
+                self._events.append(event)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Ждёт событий до timeout секунд; возвращает (события, было ли переполнение)."""
+        with self._cond:
+            if not self._events and not self.overflowed:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            overflowed, self.overflowed = self.overflowed, False
+        return events, overflowed
+
+
+class AttendanceFeed:
+    def __init__(self, buffer_size=256, max_subscribers=100):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscriptions = {}  # (item_id, дата) -> set(Subscription)
+        self._count = 0
+        self._lock = threading.Lock()
+
+        # Метрики
+        self.published_total = 0
+        self.overflows_total = 0
+        self.rejected_total = 0
+
+    def configure(self, buffer_size=256, max_subscribers=100):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+
+    def subscribe(self, item_id, day):
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                self.rejected_total += 1
+                raise FeedFullError("Слишком много открытых трансляций, попробуйте позже")
+            subscription = Subscription((item_id, day), self.buffer_size)
+            self._subscriptions.setdefault(subscription.key, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.key)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.key]
+            self._count -= 1
+
+    def publish(self, marks):
+        """Рассылает отметки [(student_id, item_id, дата, scanned_at)] подписчикам их занятий."""
+        if not self._count:
+            return
+        with self._lock:
+            for student_id, item_id, day, scanned_at in marks:
+                for subscription in self._subscriptions.get((item_id, day), ()):
+                    overflowed = subscription.overflowed
+                    subscription.push((student_id, scanned_at))
+                    if subscription.overflowed and not overflowed:
+                        self.overflows_total += 1
+            self.published_total += len(marks)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._count,
+                'lessons': len(self._subscriptions),
+                'published_total': self.published_total,
+                'overflows_total': self.overflows_total,
+                'rejected_total': self.rejected_total,
+            }
+
+
+attendance_feed = AttendanceFeed()
+
+
+def sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def encode_cursor(cursor):
+    return cursor.isoformat()
+
+
+def decode_cursor(value):
+    """Курсор из Last-Event-ID; None — заголовка нет или он не наш (нужен снимок)."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _new_marks(item_id, day, cursor, overlap):
+    """Отметки занятия не старше курсора минус overlap — короткое соединение, а не сессия на весь поток."""
+    since = cursor - timedelta(seconds=overlap) if cursor - START > timedelta(seconds=overlap) else START
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            select(Attendance.student_id, Attendance.scanned_at).where(
+                Attendance.schedule_item_id == item_id,
+                Attendance.date == day,
+                Attendance.scanned_at >= since,
+            )
+        ).all()
+    return [(row.student_id, row.scanned_at) for row in rows]
+
+
+def iter_lesson_feed(subscription, names, cursor, snapshot=None, poll_interval=5.0, duration=5.0,
+                     heartbeat=15.0, retry=2000, overlap=30.0):
+    """SSE-поток занятия: снимок, затем события scan по каждой новой отметке.
+
+    Поток короткий: через duration секунд он закрывается событием end с курсором
+    (scanned_at последней учтённой отметки), и sync-воркер gunicorn освобождается.
+    EventSource переподключается через retry мс с заголовком Last-Event-ID — тогда
+    snapshot=None: снимка нет, поток дочитывает из БД отметки от курсора минус
+    overlap секунд.
+    """
+    item_id, day = subscription.key
+    attended = {student['id'] for student in snapshot['students'] if student['attended']} if snapshot else set()
+
+    def scans(marks):
+        nonlocal cursor
+        chunk = []
+        for student_id, scanned_at in marks:
+            cursor = max(cursor, scanned_at)
+            if student_id in names and student_id not in attended:
+                attended.add(student_id)
+                chunk.append(sse('scan', {
+                    'id': student_id,
+                    'name': names[student_id],
+                    'timestamp': scanned_at.isoformat(),
+                }))
+        return ''.join(chunk)
+
+    try:
+        if snapshot is not None:
+            yield f'retry: {retry}\n' + sse('snapshot', snapshot, event_id=encode_cursor(cursor))
+        else:
+            yield f'retry: {retry}\n\n'
+        # Опрос БД — не чаще poll_interval и хотя бы раз за соединение (при переподключении
+        # пропущенное за паузу попадает в окно overlap): один запрос на соединение
+        started = last_sent = last_poll = time.monotonic()
+        polled = False
+        while time.monotonic() - started < duration:
+            marks, overflowed = subscription.wait(min(poll_interval, heartbeat, duration))
+            now = time.monotonic()
+            if overflowed or now - last_poll >= poll_interval:
+                marks += _new_marks(item_id, day, cursor, overlap)
+                last_poll, polled = now, True
+
+            chunk = scans(marks)
+            if chunk:
+                yield chunk
+                last_sent = now
+            elif now - last_sent >= heartbeat:
+                yield ': ping\n\n'  # прокси не закроет соединение, а мы узнаем об ушедшем клиенте
+                last_sent = now
+
+        marks, _ = subscription.wait(0)
+        if not polled:
+            marks += _new_marks(item_id, day, cursor, overlap)
+        yield scans(marks) + sse('end', {}, event_id=encode_cursor(cursor))
+    finally:
+        attendance_feed.unsubscribe(subscription)
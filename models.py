@@ -1,3 +1,4 @@
+from settings import env
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -7,6 +8,19 @@ from sqlalchemy.exc import IntegrityError
 
 db = SQLAlchemy()
 
+# Политика хеширования паролей (формат werkzeug: pbkdf2:sha256:<итераций>, scrypt:<n>:<r>:<p>).
+# По умолчанию 600 000 итераций PBKDF2-SHA256 (рекомендация OWASP) вместо миллиона у werkzeug:
+# вход в начале дня упирается в процессор. Старые хеши пересчитываются при входе.
+PASSWORD_HASH_METHOD = env('PASSWORD_HASH_METHOD')
+_password_hash_prefix = None
+
+def password_hash_prefix():
+    """Префикс хеша («метод$») по текущей политике — считается один раз, при первом входе."""
+    global _password_hash_prefix
+    if _password_hash_prefix is None:
+        _password_hash_prefix = generate_password_hash('', method=PASSWORD_HASH_METHOD).split('$', 1)[0]
+    return _password_hash_prefix
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -19,12 +33,21 @@ class User(UserMixin, db.Model):
     schedule_items = db.relationship('ScheduleItem', backref='teacher', lazy=True)
     attendances = db.relationship('Attendance', foreign_keys='Attendance.student_id', backref='student', lazy=True)
 
+    # Индексы под частые запросы: студенты группы и вход по логину с ролью
+    __table_args__ = (
+        db.Index('ix_users_role_group', 'role', 'group'),
+        db.Index('ix_users_username_role', 'username', 'role'),
+    )
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def needs_rehash(self):
+        return self.password_hash.split('$', 1)[0] != password_hash_prefix()
+
     def __repr__(self):
         return f"<User {self.username} ({self.role})>"
 
@@ -41,6 +64,12 @@ class ScheduleItem(db.Model):
     room = db.Column(db.String(20))
     teacher_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
+    # Занятия на день: у преподавателя и у группы; индекс по группе покрывает и фильтр только по group_name
+    __table_args__ = (
+        db.Index('ix_schedule_items_teacher_day_parity', 'teacher_id', 'day_of_week', 'week_parity'),
+        db.Index('ix_schedule_items_group_day_parity', 'group_name', 'day_of_week', 'week_parity'),
+    )
+
     def __repr__(self):
         return f"<ScheduleItem {self.subject} ({self.group_name})>"
 
@@ -59,7 +88,49 @@ class Attendance(db.Model):
     # Уникальность: один студент — одна отметка на одно занятие в день
     __table_args__ = (
         db.UniqueConstraint('student_id', 'schedule_item_id', 'date', name='uq_student_item_date'),
+        # Отметки занятий за дату (списки группы у преподавателя)
+        db.Index('ix_attendance_item_date', 'schedule_item_id', 'date'),
     )
 
     def __repr__(self):
         return f"<Attendance {self.student.username} → {self.schedule_item.subject} on {self.date}>"
+
+
+class AttendanceSummary(db.Model):
+    """Счётчик посещений студента по занятию шаблона за месяц (поддерживается инкрементально)."""
+    __tablename__ = 'attendance_summary'
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    schedule_item_id = db.Column(db.Integer, db.ForeignKey('schedule_items.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # первое число месяца, к которому относятся отметки
+    attended = db.Column(db.Integer, nullable=False, default=0)
+    last_scan_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<AttendanceSummary {self.student_id} → {self.schedule_item_id} за {self.month}: {self.attended}>"
+
+
+def upgrade_schema():
+    """Доводит схему существующей БД до моделей: новые таблицы и недостающие индексы.
+
+    db.create_all() создаёт индексы только вместе с новыми таблицами, поэтому
+    индексы уже существующих таблиц создаём отдельно (если их ещё нет).
+    Возвращает имена созданных индексов.
+    """
+    from sqlalchemy import inspect
+
+    inspector = inspect(db.engine)
+    summary = AttendanceSummary.__table__
+    if inspector.has_table(summary.name) and \
+            'month' not in {column['name'] for column in inspector.get_columns(summary.name)}:
+        # Сводка без разбивки по месяцам: её можно только пересчитать (init_database заполнит заново)
+        summary.drop(db.engine)
+    db.create_all()
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
@@ -0,0 +1,72 @@
+import secrets
+from datetime import datetime
+
+QR_TOKEN_TTL = 10  # секунд жизни токена в QR (общий для Flask и асинхронного сервиса)
+
+
+def lesson_ends_at(date_str, end_time):
+    """Момент окончания занятия на дату date_str ('YYYY-MM-DD')."""
+    return datetime.combine(datetime.strptime(date_str, '%Y-%m-%d').date(), end_time)
+
+
+def lesson_ended(date_str, end_time, now=None):
+    """Занятие на эту дату уже закончилось: токены не выдаются, сканы не принимаются."""
+    return (now or datetime.now()) >= lesson_ends_at(date_str, end_time)
+
+
+# Открытое занятие: преподаватель показывает QR, студенты сканируют.
+# Держим в памяти всё, что нужно /api/scan для проверки, — без запросов к БД.
+class LectureSession:
+    def __init__(self, item_id, group_name, teacher_id, date_str, ends_at, seed=None):
+        self.item_id = item_id
+        self.group_name = group_name
+        self.teacher_id = teacher_id
+        self.date_str = date_str
+        self.ends_at = ends_at
+        self.seed = seed or secrets.token_urlsafe(6)
+
+    def is_open(self, now=None):
+        return (now or datetime.now()) < self.ends_at
+
+    def token_data(self):
+        # Сид привязывает токен к этой сессии: после повторного открытия старые токены не пройдут быстрый путь
+        return f"{self.item_id}:{self.date_str}:{self.seed}"
+
+
+class SessionStore:
+    """Открытые сессии в кэше приложения (в памяти процесса или общем для воркеров).
+
+    Запись живёт до ends_at, так что сессия закрывается сама.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @staticmethod
+    def _key(item_id):
+        return f'lecture:{item_id}'
+
+    def open(self, item_id, group_name, teacher_id, date_str, end_time):
+        """Открывает (или возвращает уже открытую) сессию занятия на дату.
+
+        Если занятие на эту дату уже закончилось, возвращает None.
+        """
+        session = self.get(item_id)
+        if session and session.date_str == date_str:
+            return session
+        ends_at = lesson_ends_at(date_str, end_time)
+        ttl = (ends_at - datetime.now()).total_seconds()
+        if ttl <= 0:
+            return None
+        session = LectureSession(item_id, group_name, teacher_id, date_str, ends_at)
+        self.cache.set(self._key(item_id), session, ttl=ttl)
+        return session
+
+    def get(self, item_id):
+        session = self.cache.get(self._key(item_id))
+        if session is not None and not session.is_open():
+            return None
+        return session
+
+    def close(self, item_id):
+        self.cache.delete(self._key(item_id))
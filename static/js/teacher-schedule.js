@@ -4,7 +4,7 @@ class TeacherScheduleApp {
         this.currentDate = new Date(); 
         this.selectedDate = null;
         this.fullSchedule = {}; // { "2025-10-01": [...] }
-        this.semesterStart = new Date(2025, 8, 1); // 1 сентября 2025 (месяцы с 0!)
+        this.semesterStart = this.parseTermStart(); // начало семестра с сервера (TERM_START)
         this.groups = [
             'Д-Э 307', 'Д-Э 309', 'Д-Э 310', 'Д-Э 342', 'Д-Э 317',
             'Д-Э 341', 'Д-Э 312', 'Д-Э 315', 'Д-Э 318', 'Д-Э 316', "Д-Э 343", "Д-Э 301"
@@ -14,15 +14,40 @@ class TeacherScheduleApp {
         this.init();
     }
 
+    parseTermStart() {
+        const [y, m, d] = (window.TERM_START || '2025-09-01').split('-').map(Number);
+        return new Date(y, m - 1, d);
+    }
+
+    // Понедельник недели, в которую начался семестр: недели считаются с понедельника
+    getFirstMonday() {
+        const monday = new Date(this.semesterStart);
+        monday.setDate(monday.getDate() - (monday.getDay() + 6) % 7);
+        return monday;
+    }
+
     async init() {
         await this.loadSchedule();
         this.renderCalendar();
         this.showClassesForDate(this.selectedDate || new Date());
     }
 
+    // Видимая сетка месяца: с понедельника первой недели до воскресенья последней
+    getVisibleRange() {
+        const first = new Date(this.currentDate.getFullYear(), this.currentDate.getMonth(), 1);
+        const last = new Date(this.currentDate.getFullYear(), this.currentDate.getMonth() + 1, 0);
+        const from = new Date(first);
+        from.setDate(first.getDate() - (first.getDay() + 6) % 7);
+        const to = new Date(last);
+        to.setDate(last.getDate() + (7 - last.getDay()) % 7);
+        return { from: this.formatDate(from), to: this.formatDate(to) };
+    }
+
     async loadSchedule() {
         try {
-            const res = await fetch('/api/teacher/schedule');
+            // Загружаем только видимый месяц, а не весь семестр
+            const { from, to } = this.getVisibleRange();
+            const res = await fetch(`/api/teacher/schedule?from=${from}&to=${to}`);
             if (!res.ok) throw new Error(`HTTP ${res.status}`);
             this.fullSchedule = await res.json();
         } catch (e) {
@@ -34,11 +59,10 @@ class TeacherScheduleApp {
     getWeekInfo(date) {
     const dow = date.getDay() === 0 ? 7 : date.getDay(); // ISO: 1=пн, 7=вс
 
-    // 🔹 Неделя от начала семестра (1 сентября 2025)
-    const semesterStart = new Date(2025, 8, 1); // сентябрь = 8 (месяцы с 0)
-    const diffMs = date - semesterStart;
-    const diffDays = Math.floor(diffMs / (1000 * 60 * 60 * 24));
-    const weekNum = Math.floor(diffDays / 7) + 1; // 1-я неделя = с 1 сен
+    // 🔹 Календарная неделя от начала семестра (как academic_term.week на сервере)
+    const diffMs = date - this.getFirstMonday();
+    const diffDays = Math.round(diffMs / (1000 * 60 * 60 * 24)); // round — из-за перевода часов
+    const weekNum = Math.floor(diffDays / 7) + 1; // 1-я неделя — та, где начало семестра
     const parity = weekNum % 2; // 1 — нечётная, 0 — чётная
 
     return { weekNum, parity };
@@ -147,12 +171,16 @@ class TeacherScheduleApp {
     }
 
     // === Навигация по месяцам ===
-    prevMonth() {
+    async prevMonth() {
+        this.currentDate.setDate(1);
         this.currentDate.setMonth(this.currentDate.getMonth() - 1);
+        await this.loadSchedule();
         this.renderCalendar();
     }
-    nextMonth() {
+    async nextMonth() {
+        this.currentDate.setDate(1);
         this.currentDate.setMonth(this.currentDate.getMonth() + 1);
+        await this.loadSchedule();
         this.renderCalendar();
     }
 
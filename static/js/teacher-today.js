@@ -6,7 +6,8 @@ class TeacherTodayView {
 
     async loadSchedule() {
         try {
-            const res = await fetch('/api/teacher/schedule', {
+            const today = this.formatDate(new Date());
+            const res = await fetch(`/api/teacher/schedule?from=${today}&to=${today}`, {
             credentials: 'include'  // ← ЭТО КЛЮЧЕВОЙ МОМЕНТ!
             });
             if (!res.ok) throw new Error(`HTTP ${res.status}`);
@@ -0,0 +1,186 @@
+from datetime import timedelta
+
+from sqlalchemy import event, func, case, cast, select, or_
+
+from models import db, Attendance, AttendanceSummary, ScheduleItem
+
+# Сводка attendance_summary: (студент, занятие, месяц) → число посещений и последний скан.
+# Обновляется при каждой вставке/удалении отметки, поэтому статистика за семестр
+# читает O(предметов × месяцев) строк вне зависимости от того, сколько сканов накопилось.
+# Разбивка по месяцам нужна, чтобы считать только окно текущего семестра.
+
+summary_table = AttendanceSummary.__table__
+
+
+def month_of(day):
+    """Ключ месяца в сводке — первое число месяца."""
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def apply_summary_delta(connection, deltas):
+    """Применяет {(student_id, item_id, месяц): (изменение счётчика, время скана или None)}."""
+    if not deltas:
+        return
+    rows = [{
+        'student_id': student_id,
+        'schedule_item_id': item_id,
+        'month': month,
+        'attended': delta,
+        'last_scan_at': scanned_at,
+    } for (student_id, item_id, month), (delta, scanned_at) in deltas.items()]
+
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(summary_table)
+        current = summary_table.c
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'schedule_item_id', 'month'],
+            set_={
+                'attended': current.attended + stmt.excluded.attended,
+                'last_scan_at': case(
+                    (current.last_scan_at.is_(None), stmt.excluded.last_scan_at),
+                    (stmt.excluded.last_scan_at > current.last_scan_at, stmt.excluded.last_scan_at),
+                    else_=current.last_scan_at,
+                ),
+            },
+        )
+        connection.execute(stmt, rows)
+        return
+
+    # Без UPSERT: сначала UPDATE, при отсутствии строки — INSERT
+    for row in rows:
+        key = (summary_table.c.student_id == row['student_id']) & \
+              (summary_table.c.schedule_item_id == row['schedule_item_id']) & \
+              (summary_table.c.month == row['month'])
+        values = {'attended': summary_table.c.attended + row['attended']}
+        if row['last_scan_at'] is not None:
+            values['last_scan_at'] = row['last_scan_at']
+        if connection.execute(summary_table.update().where(key).values(**values)).rowcount == 0:
+            connection.execute(summary_table.insert().values(**row))
+
+
+def record_inserted(connection, inserted_rows):
+    """Учитывает в сводке только что вставленные отметки [(student_id, item_id, date, scanned_at)]."""
+    deltas = {}
+    for student_id, item_id, day, scanned_at in inserted_rows:
+        key = (student_id, item_id, month_of(day))
+        count, last = deltas.get(key, (0, None))
+        deltas[key] = (count + 1, max(last, scanned_at) if last else scanned_at)
+    apply_summary_delta(connection, deltas)
+
+
+def record_deleted(connection, student_id, item_id, day):
+    """Учитывает удалённую отметку: счётчик -1, последний скан — из оставшихся отметок того же месяца."""
+    month = month_of(day)
+    attendance = Attendance.__table__
+    last_scan = select(func.max(attendance.c.scanned_at)).where(
+        attendance.c.student_id == student_id,
+        attendance.c.schedule_item_id == item_id,
+        attendance.c.date >= month,
+        attendance.c.date < _next_month(month),
+    ).scalar_subquery()
+    connection.execute(summary_table.update().where(
+        summary_table.c.student_id == student_id,
+        summary_table.c.schedule_item_id == item_id,
+        summary_table.c.month == month,
+    ).values(attended=summary_table.c.attended - 1, last_scan_at=last_scan))
+
+
+# ORM-путь (db.session.add / delete) — через события маппера
+@event.listens_for(Attendance, 'after_insert')
+def _attendance_inserted(mapper, connection, target):
+    record_inserted(connection, [(target.student_id, target.schedule_item_id, target.date, target.scanned_at)])
+
+@event.listens_for(Attendance, 'after_delete')
+def _attendance_deleted(mapper, connection, target):
+    record_deleted(connection, target.student_id, target.schedule_item_id, target.date)
+
+@event.listens_for(ScheduleItem, 'before_delete')
+def _schedule_item_deleted(mapper, connection, target):
+    connection.execute(summary_table.delete().where(summary_table.c.schedule_item_id == target.id))
+
+
+def _month_column():
+    """SQL-выражение «первое число месяца» для Attendance.date."""
+    if db.engine.dialect.name == 'sqlite':
+        return func.date(Attendance.date, 'start of month', type_=db.Date)
+    return cast(func.date_trunc('month', Attendance.date), db.Date)
+
+
+def _actual_counts():
+    month = _month_column()
+    return select(
+        Attendance.student_id,
+        Attendance.schedule_item_id,
+        month,
+        func.count(Attendance.id),
+        func.max(Attendance.scanned_at),
+    ).group_by(Attendance.student_id, Attendance.schedule_item_id, month)
+
+
+def attended_by_item(student_id, item_ids, start, end):
+    """{item_id: число отметок студента с датой в [start, end]}.
+
+    Целые месяцы окна берутся из сводки, неполные крайние — из сырых отметок
+    (не больше двух месяцев сканов одного студента).
+    """
+    if not item_ids:
+        return {}
+    first_full = start if start.day == 1 else _next_month(start)
+    after_full = month_of(end + timedelta(days=1))
+    counts = {}
+
+    if first_full < after_full:
+        rows = db.session.query(
+            AttendanceSummary.schedule_item_id, func.sum(AttendanceSummary.attended)
+        ).filter(
+            AttendanceSummary.student_id == student_id,
+            AttendanceSummary.schedule_item_id.in_(item_ids),
+            AttendanceSummary.month >= first_full,
+            AttendanceSummary.month < after_full,
+        ).group_by(AttendanceSummary.schedule_item_id)
+        counts.update((item_id, int(attended or 0)) for item_id, attended in rows)
+        edges = [(start, first_full - timedelta(days=1)), (after_full, end)]
+    else:
+        edges = [(start, end)]
+
+    edges = [Attendance.date.between(low, high) for low, high in edges if low <= high]
+    if edges:
+        rows = db.session.query(Attendance.schedule_item_id, func.count(Attendance.id)).filter(
+            Attendance.student_id == student_id,
+            Attendance.schedule_item_id.in_(item_ids),
+            or_(*edges),
+        ).group_by(Attendance.schedule_item_id)
+        for item_id, attended in rows:
+            counts[item_id] = counts.get(item_id, 0) + attended
+    return counts
+
+
+def check_attendance_summary():
+    """Сравнивает сводку с сырыми отметками; возвращает список расхождений."""
+    actual = {(s, i, m): (count, last) for s, i, m, count, last in db.session.execute(_actual_counts())}
+    stored = {(row.student_id, row.schedule_item_id, row.month): (row.attended, row.last_scan_at)
+              for row in AttendanceSummary.query if row.attended}
+    mismatches = []
+    for key in actual.keys() | stored.keys():
+        if actual.get(key) != stored.get(key):
+            mismatches.append((key, stored.get(key), actual.get(key)))
+    return mismatches
+
+
+def rebuild_attendance_summary():
+    """Пересчитывает сводку с нуля одним INSERT ... SELECT."""
+    db.session.execute(summary_table.delete())
+    db.session.execute(summary_table.insert().from_select(
+        ['student_id', 'schedule_item_id', 'month', 'attended', 'last_scan_at'],
+        _actual_counts()
+    ))
+    db.session.commit()
@@ -0,0 +1,106 @@
+from settings import env
+from datetime import date, timedelta
+
+
+def _parse_holidays(value):
+    # "2025-11-04,2025-12-29..2025-12-31" -> множество дат
+    holidays = set()
+    for part in filter(None, (p.strip() for p in (value or '').split(','))):
+        if '..' in part:
+            first, last = (date.fromisoformat(x) for x in part.split('..', 1))
+            while first <= last:
+                holidays.add(first)
+                first += timedelta(days=1)
+        else:
+            holidays.add(date.fromisoformat(part))
+    return holidays
+
+
+# Учебный семестр: границы, праздники и чётность недель.
+# Недели календарные (с понедельника): неделя 1 — та, в которую попадает первый день
+# семестра, она нечётная (чётность 1), неделя 2 — чётная (0).
+class AcademicTerm:
+    def __init__(self, start, end, holidays=(), classes_end=None):
+        self.start = start
+        self.end = end
+        self.first_monday = start - timedelta(days=start.isoweekday() - 1)
+        self.classes_end = classes_end or end  # последний день занятий (дальше — сессия)
+        self.holidays = frozenset(holidays)
+
+        # Таблица на каждый день семестра: (номер недели, чётность, учебный ли день)
+        self._days = []
+        # Префиксные суммы учебных дней для каждого (день недели, чётность):
+        # число занятий слота на любом отрезке — разность двух чисел
+        self._prefix = {(dow, parity): [0] for dow in range(1, 8) for parity in (0, 1)}
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            week_num, parity = self._week_of(day)
+            teaching = day not in self.holidays
+            self._days.append((week_num, parity, teaching))
+            for slot, prefix in self._prefix.items():
+                hit = teaching and slot == (day.isoweekday(), parity)
+                prefix.append(prefix[-1] + hit)
+
+    @classmethod
+    def from_env(cls):
+        # Без TERM_START/TERM_END — осенний семестр 2025 с сессией с 21 декабря;
+        # если границы заданы, а TERM_CLASSES_END нет, занятия идут до конца семестра
+        start, end = env('TERM_START'), env('TERM_END')
+        if start or end:
+            classes_end = env('TERM_CLASSES_END')
+        else:
+            classes_end = env('TERM_CLASSES_END') or '2025-12-20'
+        return cls(
+            start=date.fromisoformat(start or '2025-09-01'),
+            end=date.fromisoformat(end or '2025-12-31'),
+            classes_end=date.fromisoformat(classes_end) if classes_end else None,
+            holidays=_parse_holidays(env('TERM_HOLIDAYS')),
+        )
+
+    def _week_of(self, day):
+        week_num = (day - self.first_monday).days // 7 + 1
+        return week_num, week_num % 2
+
+    def week(self, day):
+        """(номер недели, чётность) для любой даты; внутри семестра — из таблицы."""
+        offset = (day - self.start).days
+        if 0 <= offset < len(self._days):
+            return self._days[offset][:2]
+        return self._week_of(day)
+
+    def parity(self, day):
+        return self.week(day)[1]
+
+    def is_holiday(self, day):
+        return day in self.holidays
+
+    def is_teaching_day(self, day):
+        offset = (day - self.start).days
+        return 0 <= offset < len(self._days) and self._days[offset][2]
+
+    def count_lessons(self, day_of_week, week_parity, start_date, end_date):
+        """Сколько учебных дней слота (день недели, чётность) на отрезке — за O(1)."""
+        prefix = self._prefix.get((day_of_week, week_parity))
+        if prefix is None:
+            return 0
+        a = max((start_date - self.start).days, 0)
+        b = min((end_date - self.start).days, len(self._days) - 1)
+        if b < a:
+            return 0
+        return prefix[b + 1] - prefix[a]
+
+    def iter_lesson_dates(self, day_of_week, week_parity, start_date, end_date):
+        """Даты слота на отрезке без праздников: сразу к первой подходящей, дальше шаг 14 дней."""
+        if week_parity not in (0, 1) or not 1 <= day_of_week <= 7:
+            return
+        # Слот приходится на дни n ≡ k (mod 14) от понедельника первой недели
+        k = 7 * (1 - week_parity) + day_of_week - 1
+        current = start_date + timedelta(days=(k - (start_date - self.first_monday).days) % 14)
+        step = timedelta(days=14)
+        while current <= end_date:
+            if current not in self.holidays:
+                yield current
+            current += step
+
+
+academic_term = AcademicTerm.from_env()
@@ -0,0 +1,187 @@
+import contextlib
+import itertools
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import time as dtime
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# app.py читает настройки при импорте: БД — временный SQLite или TEST_DATABASE_URL
+# (одноразовая, таблицы в ней пересоздаются в каждом тесте)
+if os.getenv('TEST_DATABASE_URL'):
+    os.environ['DATABASE_URL'] = os.environ['TEST_DATABASE_URL']
+else:
+    _fd, _path = tempfile.mkstemp(prefix='qr-test-', suffix='.db')
+    os.close(_fd)
+    os.environ['DATABASE_URL'] = f'sqlite:///{_path}'
+os.environ.pop('CACHE_URL', None)
+os.environ.pop('ATTENDANCE_WRITE_BEHIND', None)
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app as app_module
+    return app_module
+
+
+@pytest.fixture
+def reset_db(app_module):
+    """Пустая БД и пустые кэши процесса; можно вызвать повторно внутри теста."""
+    from models import db
+    from cache import shared_cache
+
+    def reset():
+        with app_module.app.app_context():
+            db.drop_all()
+            db.create_all()
+        shared_cache.clear()
+        app_module.timetable_index.invalidate()
+
+    reset()
+    return reset
+
+
+@pytest.fixture
+def flask_app(app_module, reset_db):
+    return app_module.app
+
+
+@pytest.fixture
+def engine(flask_app):
+    from models import db
+
+    with flask_app.app_context():
+        return db.engine
+
+
+@pytest.fixture
+def other_worker(flask_app):
+    """Запуск функции в форкнутом процессе — как второй воркер gunicorn с тем же кодом.
+
+    other_worker(fn, *args) -> (процесс, события): fn(events, *args) выполняется в
+    контексте приложения; events — словарь multiprocessing.Event и Queue для синхронизации.
+    """
+    ctx = multiprocessing.get_context('fork')
+    started = []
+
+    def start(fn, *args):
+        events = {'ready': ctx.Event(), 'changed': ctx.Event(), 'result': ctx.Queue()}
+
+        def target():
+            from models import db
+
+            with flask_app.app_context():
+                db.engine.dispose(close=False)  # соединения родителя в дочернем процессе не трогаем
+                events['result'].put(fn(events, *args))
+
+        process = ctx.Process(target=target, daemon=True)
+        process.start()
+        started.append(process)
+        return process, events
+
+    yield start
+    for process in started:
+        process.join(10)
+        if process.is_alive():
+            process.kill()
+
+
+@pytest.fixture
+def login(flask_app):
+    """login(user_id) -> тестовый клиент с уже залогиненным пользователем (без проверки пароля)."""
+    def client(user_id):
+        client = flask_app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+        return client
+    return client
+
+
+@pytest.fixture
+def count_queries(engine):
+    """with count_queries() as counter: ... — counter.count SQL-запросов внутри блока."""
+    from sqlalchemy import event
+
+    @contextlib.contextmanager
+    def count():
+        counter = SimpleNamespace(count=0)
+
+        def on_execute(*args):
+            counter.count += 1
+
+        event.listen(engine, 'before_cursor_execute', on_execute)
+        try:
+            yield counter
+        finally:
+            event.remove(engine, 'before_cursor_execute', on_execute)
+    return count
+
+
+Lesson = namedtuple('Lesson', ['teacher_id', 'item_id', 'student_ids', 'group'])
+
+
+@pytest.fixture
+def make_lesson(flask_app):
+    """make_lesson(...) -> Lesson: преподаватель, занятие шаблона и students студентов группы.
+
+    По умолчанию — понедельник нечётной недели 9:00–10:30 (1 сентября 2025 — такой день);
+    day=дата — занятие в день недели и чётность этой даты. teacher_id — занятие
+    существующего преподавателя.
+    """
+    from models import db, User, ScheduleItem
+    from term import academic_term
+
+    numbers = itertools.count(1)
+
+    def make(students=0, group='G', day=None, start=dtime(9), end=dtime(10, 30), subject='Предмет',
+             teacher_id=None, **columns):
+        n = next(numbers)
+        with flask_app.app_context():
+            if teacher_id is None:
+                teacher = User(username=f'teacher-{n}', role='teacher', password_hash='-')
+                db.session.add(teacher)
+                db.session.flush()
+                teacher_id = teacher.id
+            members = [User(username=f'{group}-{n}-s{i}', role='student', group=group, password_hash='-')
+                       for i in range(students)]
+            item = ScheduleItem(day_of_week=day.isoweekday() if day else 1,
+                                week_parity=academic_term.parity(day) if day else 1,
+                                start_time=start, end_time=end, subject=subject, group_name=group,
+                                teacher_id=teacher_id, **columns)
+            db.session.add_all([item, *members])
+            db.session.commit()
+            return Lesson(teacher_id, item.id, [student.id for student in members], group)
+    return make
+
+
+@pytest.fixture
+def wait_job(app_module):
+    """wait_job(id) -> описание фоновой задачи, когда она завершится (или через timeout секунд)."""
+    def wait(job_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        job = app_module.job_runner.get(job_id)
+        while job['status'] not in ('done', 'failed') and time.monotonic() < deadline:
+            time.sleep(0.05)
+            job = app_module.job_runner.get(job_id)
+        return job
+    return wait
+
+
+@pytest.fixture
+def make_university(app_module, flask_app):
+    """make_university(**параметры bench.generate) -> University: синтетический университет."""
+    from bench.generate import generate
+
+    def make(**kwargs):
+        return generate(app_module, verbose=False, **kwargs)
+    return make
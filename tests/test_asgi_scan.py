@@ -0,0 +1,56 @@
+"""asgi_scan: обращения к общему кэшу не блокируют цикл событий."""
+import asyncio
+import threading
+from datetime import date, time as dtime
+
+import pytest
+
+from cache import SharedCache
+
+
+@pytest.fixture
+def asgi_scan(app_module):
+    import asgi_scan
+    return asgi_scan
+
+
+@pytest.mark.parametrize('url, off_loop', [('local', False), ('sqlite:///{tmp}/cache.db', True)])
+def test_cache_calls_leave_event_loop_for_shared_backend(asgi_scan, monkeypatch, tmp_path, url, off_loop):
+    cache = SharedCache()
+    cache.configure(url.format(tmp=tmp_path))
+    cache.set('item:7', ('G-1', 3, dtime(10, 30)))
+    threads = []
+    backend_get = cache.backend.get
+
+    def get(key, default=None):
+        threads.append(threading.current_thread())
+        return backend_get(key, default)
+
+    monkeypatch.setattr(cache.backend, 'get', get)
+    monkeypatch.setattr(asgi_scan, 'shared_cache', cache)
+
+    async def call():
+        return await asgi_scan.get_item_info(7), threading.current_thread()
+
+    info, loop_thread = asyncio.run(call())
+    assert info == ('G-1', 3, dtime(10, 30))
+    assert (threads[0] is not loop_thread) == off_loop
+
+
+def test_ended_lesson_is_closed_in_asgi_service(asgi_scan, app_module, flask_app, make_lesson, login):
+    from starlette.testclient import TestClient
+
+    teacher_id, item_id, (student_id,), _ = make_lesson(students=1, day=date.today(), start=dtime(0, 0),
+                                                        end=dtime(0, 0, 1))
+    token = app_module.serializer.dumps(f'{item_id}:{date.today().isoformat()}')
+
+    def client(user_id):
+        cookie = login(user_id).get_cookie(flask_app.config['SESSION_COOKIE_NAME'])
+        return TestClient(asgi_scan.app, cookies={cookie.key: cookie.value})
+
+    with client(teacher_id) as teacher:
+        assert teacher.get(f'/api/qr/{item_id}/token').status_code == 410
+    with client(student_id) as student:
+        response = student.post('/api/scan', json={'item_id': item_id, 'date': date.today().isoformat(),
+                                                    'token': token})
+        assert response.status_code == 410
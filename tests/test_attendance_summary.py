@@ -0,0 +1,68 @@
+"""Сводка attendance_summary совпадает с сырыми отметками после вставок и удалений."""
+from datetime import date, datetime, time as dtime
+
+import pytest
+
+from models import db, Attendance, AttendanceSummary
+from summary import attended_by_item, check_attendance_summary
+
+SEPTEMBER = date(2025, 9, 1)
+
+
+def add_scans(student_id, item_id, *days):
+    db.session.add_all(Attendance(student_id=student_id, schedule_item_id=item_id, date=day,
+                                  scanned_at=datetime.combine(day, dtime(9, 5)))
+                       for day in days)
+    db.session.commit()
+
+
+@pytest.fixture
+def seeded(flask_app, make_lesson):
+    """Студент группы G с двумя отметками в сентябре: (student_id, item_id)."""
+    lesson = make_lesson(students=1)
+    (student_id,) = lesson.student_ids
+    with flask_app.app_context():
+        add_scans(student_id, lesson.item_id, date(2025, 9, 1), date(2025, 9, 15))
+    return student_id, lesson.item_id
+
+
+def test_deleting_latest_scan_moves_last_scan_back(flask_app, seeded):
+    student_id, item_id = seeded
+    with flask_app.app_context():
+        first, latest = Attendance.query.order_by(Attendance.date).all()
+        db.session.delete(latest)
+        db.session.commit()
+        row = db.session.get(AttendanceSummary, (student_id, item_id, SEPTEMBER))
+        assert (row.attended, row.last_scan_at) == (1, first.scanned_at)
+        assert check_attendance_summary() == []
+
+        db.session.delete(first)
+        db.session.commit()
+        row = db.session.get(AttendanceSummary, (student_id, item_id, SEPTEMBER))
+        assert (row.attended, row.last_scan_at) == (0, None)
+        assert check_attendance_summary() == []
+
+
+def test_insert_path_keeps_summary_in_sync(flask_app, seeded):
+    from helpers import mark_attendance
+
+    student_id, item_id = seeded
+    with flask_app.app_context():
+        assert mark_attendance(student_id, item_id, date(2025, 9, 29))
+        assert not mark_attendance(student_id, item_id, date(2025, 9, 29))
+        assert db.session.get(AttendanceSummary, (student_id, item_id, SEPTEMBER)).attended == 3
+        assert check_attendance_summary() == []
+
+
+def test_attended_counts_only_the_term_window(flask_app, seeded, login):
+    student_id, item_id = seeded
+    with flask_app.app_context():
+        # прошлый год, сессия после classes_end и последняя неделя занятий
+        add_scans(student_id, item_id, date(2024, 9, 2), date(2025, 12, 29), date(2025, 12, 22), date(2025, 12, 15))
+        assert check_attendance_summary() == []
+
+        assert attended_by_item(student_id, [item_id], date(2025, 9, 10), date(2025, 12, 20)) == {item_id: 2}
+        assert attended_by_item(student_id, [item_id], date(2025, 9, 1), date(2025, 9, 30)) == {item_id: 2}
+
+    (stat,) = login(student_id).get('/api/attendance').get_json()
+    assert (stat['attended'], stat['expected']) == (3, 8)
@@ -0,0 +1,36 @@
+"""Вход: хеш пароля по старой политике пересчитывается при успешном входе."""
+from werkzeug.security import generate_password_hash
+
+import models
+from models import db, User
+
+
+def test_login_rehashes_old_password_hash(flask_app, monkeypatch):
+    monkeypatch.setattr(models, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:2000')
+    monkeypatch.setattr(models, '_password_hash_prefix', None)
+    with flask_app.app_context():
+        old_hash = generate_password_hash('secret', method='pbkdf2:sha256:1000')
+        user = User(username='s1', role='student', password_hash=old_hash)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    def login(password):
+        form = {'username': 's1', 'password': password, 'role': 'student'}
+        resp = flask_app.test_client().post('/login', data=form)
+        with flask_app.app_context():
+            return resp, db.session.get(User, user_id)
+
+    # Неверный пароль — хеш не трогаем
+    resp, user = login('wrong')
+    assert resp.status_code == 200 and user.password_hash == old_hash
+
+    resp, user = login('secret')
+    assert resp.status_code == 302
+    assert user.password_hash.startswith('pbkdf2:sha256:2000$') and user.check_password('secret')
+    assert not user.needs_rehash()
+
+    # Хеш уже по текущей политике — второй вход его не переписывает
+    new_hash = user.password_hash
+    resp, user = login('secret')
+    assert resp.status_code == 302 and user.password_hash == new_hash
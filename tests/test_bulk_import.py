@@ -0,0 +1,67 @@
+"""Массовый импорт: конфликты и ошибки в отчёте, прогресс по пачкам."""
+import csv
+import io
+
+import bulk_import
+from models import db, User, ScheduleItem
+
+ROSTER = """username,password,role,group
+new-1,p1,student,G1
+taken,p2,student,G1
+new-1,p3,student,G1
+no-group,p4,student,
+new-2,p5,teacher,
+"""
+
+
+def test_roster_import_reports_conflicts_and_progress(app_module, flask_app, login, wait_job, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module.job_runner, 'result_dir', str(tmp_path))
+    monkeypatch.setattr(app_module, 'IMPORT_HASH_WORKERS', 1)
+    monkeypatch.setattr(bulk_import, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    with flask_app.app_context():
+        teacher = User(username='taken', role='teacher', password_hash='-')
+        db.session.add(teacher)
+        db.session.commit()
+        teacher_id = teacher.id
+
+    client = login(teacher_id)
+    resp = client.post('/api/teacher/import/roster', data={'file': (io.BytesIO(ROSTER.encode()), 'roster.csv')})
+    assert resp.status_code == 202
+    job = wait_job(resp.get_json()['id'])
+    assert job['status'] == 'done'
+    progress = {key: job['progress'][key] for key in ('read', 'inserted', 'conflicts', 'errors')}
+    assert progress == {'read': 5, 'inserted': 2, 'conflicts': 2, 'errors': 1}
+
+    report = client.get(f"/api/jobs/{job['id']}/download").get_data(as_text=True).lstrip('﻿')
+    assert [(line, kind) for line, kind, _ in list(csv.reader(io.StringIO(report)))[1:]] == [
+        ('3', 'Конфликт'), ('4', 'Конфликт'), ('5', 'Ошибка'),
+    ]
+    with flask_app.app_context():
+        users = {user.username: user for user in User.query.filter(User.username.like('new-%'))}
+        assert users['new-1'].group == 'G1' and users['new-1'].check_password('p1')
+        assert users['new-2'].role == 'teacher' and users['new-2'].group is None
+
+
+def test_timetable_import_conflicts_and_progress_per_batch(flask_app, make_lesson):
+    lesson = make_lesson(group='G1')  # понедельник нечётной недели, 9:00
+    rows = [
+        '1,1,09:00,10:30,Физика,G1',   # занято уже существующим занятием
+        '1,1,11:00,12:30,Химия,G1',
+        '1,1,11:00,12:30,Химия,G1',    # повтор строки выше
+        '2,0,09:00,08:00,Физика,G1',   # конец раньше начала
+        '3,0,09:00,10:30,Физика,G2',
+    ]
+    table = 'day_of_week,week_parity,start_time,end_time,subject,group_name\n' + '\n'.join(rows)
+    seen = []
+    with flask_app.app_context():
+        report = bulk_import.import_timetable(
+            bulk_import.iter_table(io.BytesIO(table.encode()), 'timetable.csv'), lesson.teacher_id,
+            batch_size=2, progress=lambda report: seen.append(report.as_dict()['read']))
+        assert ScheduleItem.query.filter_by(teacher_id=lesson.teacher_id).count() == 3
+
+    assert (report.read, report.inserted, report.conflicts, report.errors) == (5, 2, 2, 1)
+    assert [(line, kind) for line, kind, _ in sorted(report.problems)] == [
+        (2, 'conflict'), (4, 'conflict'), (5, 'error'),
+    ]
+    # Пачка — batch_size корректных строк: строка с ошибкой в пачку не входит
+    assert seen == [2, 5]
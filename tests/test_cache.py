@@ -0,0 +1,126 @@
+"""Кэш приложения: согласованность между процессами и срок жизни копий строк БД."""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from cache import LRUCache, SharedCache, make_cache
+
+STEPS = (
+    ('set', ('G-1', 7, None)),
+    ('update', ('G-2', 7, None)),
+    ('delete', None),
+    ('ttl', ('G-3', 7, None)),
+)
+
+
+def _worker(url, index, barrier, results):
+    # Процесс 0 пишет и сбрасывает, после каждого шага все читают одно и то же
+    cache = make_cache(url)
+    seen = []
+    for step, value in STEPS:
+        if index == 0:
+            if step == 'delete':
+                cache.delete('item:1')
+            elif step == 'ttl':
+                cache.set('item:1', value, ttl=0.2)
+            else:
+                cache.set('item:1', value)
+        barrier.wait()
+        if step == 'ttl':
+            time.sleep(0.3)
+        seen.append(cache.get('item:1'))
+        barrier.wait()
+    results[index] = seen
+
+
+def _run(url, processes=3):
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        barrier = ctx.Barrier(processes)
+        procs = [ctx.Process(target=_worker, args=(url, i, barrier, results)) for i in range(processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(30)
+        return [results.get(i) for i in range(processes)]
+
+
+def test_sqlite_backend_is_consistent_across_processes(tmp_path):
+    expected = [('G-1', 7, None), ('G-2', 7, None), None, None]
+    assert _run(f'sqlite:///{tmp_path / "cache.db"}') == [expected] * 3
+
+
+@pytest.mark.skipif(not os.getenv('TEST_CACHE_URL'), reason='TEST_CACHE_URL (например, redis://) не задан')
+def test_external_backend_is_consistent_across_processes():
+    make_cache(os.environ['TEST_CACHE_URL']).clear()
+    expected = [('G-1', 7, None), ('G-2', 7, None), None, None]
+    assert _run(os.environ['TEST_CACHE_URL']) == [expected] * 3
+
+
+def test_local_backend_diverges_across_processes():
+    # Поэтому у локального бэкенда короткий data_ttl
+    results = _run('local')
+    assert results[0] == [('G-1', 7, None), ('G-2', 7, None), None, None]
+    assert results[1] == [None] * 4
+
+
+def test_data_ttl_is_capped_only_for_local_backend(tmp_path):
+    cache = SharedCache()
+    cache.configure('local', local_max_ttl=5)
+    assert isinstance(cache.backend, LRUCache) and not cache.is_shared
+    assert cache.data_ttl(3600) == 5
+    assert cache.data_ttl(2) == 2
+    assert cache.data_ttl(None) == 5
+    cache.configure(f'sqlite:///{tmp_path / "cache.db"}', local_max_ttl=5)
+    assert cache.is_shared
+    assert cache.data_ttl(3600) == 3600
+
+
+def test_lru_evicts_and_expires():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+    cache.set('d', 4, ttl=-1)
+    assert cache.get('d') is None
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        make_cache('bogus://x')
+
+
+def _poll_item_group(events, item_id, expected, timeout):
+    from helpers import get_item_info
+
+    get_item_info(item_id)  # копия в локальном кэше этого воркера
+    events['ready'].set()
+    events['changed'].wait(10)
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        if get_item_info(item_id)[0] == expected:
+            return time.monotonic() - t0
+        time.sleep(0.05)
+    return None
+
+
+def test_item_change_reaches_other_worker_with_local_backend(flask_app, other_worker, make_lesson, monkeypatch):
+    from cache import shared_cache
+    from models import db, ScheduleItem
+
+    monkeypatch.setattr(shared_cache, 'local_max_ttl', 0.5)
+    item_id = make_lesson(group='G1').item_id
+
+    process, events = other_worker(_poll_item_group, item_id, 'G2', 5)
+    assert events['ready'].wait(10)
+    with flask_app.app_context():
+        db.session.get(ScheduleItem, item_id).group_name = 'G2'
+        db.session.commit()
+    events['changed'].set()
+    elapsed = events['result'].get(timeout=10)
+    assert elapsed is not None and elapsed <= 1.5
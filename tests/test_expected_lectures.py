@@ -0,0 +1,50 @@
+"""Подсчёт ожидаемых занятий по таблице семестра против обхода по дням."""
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from term import AcademicTerm
+
+
+def count_by_days(term, item, start, end):
+    # Эталон: перебор всех дней (недели с понедельника, неделя начала семестра — первая, нечётная)
+    first_monday = term.start - timedelta(days=term.start.weekday())
+    count = 0
+    day = start
+    while day <= end:
+        if term.is_teaching_day(day) and day.isoweekday() == item.day_of_week:
+            if ((day - first_monday).days // 7 + 1) % 2 == item.week_parity:
+                count += 1
+        day += timedelta(days=1)
+    return count
+
+
+def random_term(rng):
+    start = date(2025, 9, 1) + timedelta(days=rng.randint(-400, 400))
+    end = start + timedelta(days=rng.randint(0, 200))
+    holidays = {start + timedelta(days=rng.randint(0, 200)) for _ in range(rng.randint(0, 10))}
+    return AcademicTerm(start, end, holidays)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_count_lessons_matches_day_by_day_loop(seed):
+    # Включая дни недели и чётности вне диапазона и отрезки до начала семестра
+    rng = random.Random(seed)
+    for _ in range(1000):
+        term = random_term(rng)
+        item = SimpleNamespace(day_of_week=rng.randint(0, 8), week_parity=rng.randint(-1, 2))
+        start = term.start + timedelta(days=rng.randint(-60, 200))
+        end = start + timedelta(days=rng.randint(-30, 250))
+        expected = count_by_days(term, item, start, end)
+        assert term.count_lessons(item.day_of_week, item.week_parity, start, end) == expected, (item, start, end)
+        dates = list(term.iter_lesson_dates(item.day_of_week, item.week_parity, start, end))
+        assert len([d for d in dates if term.is_teaching_day(d)]) == expected, (item, start, end)
+
+
+def test_holidays_are_not_counted():
+    term = AcademicTerm(date(2025, 9, 1), date(2025, 12, 31), {date(2025, 9, 1)})
+    # 1 сентября — понедельник нечётной (первой) недели
+    assert term.count_lessons(1, 1, date(2025, 9, 1), date(2025, 9, 14)) == 0
+    assert term.count_lessons(1, 1, date(2025, 9, 1), date(2025, 9, 15)) == 1
@@ -0,0 +1,60 @@
+"""Выгрузка посещаемости за отрезок дат: строки CSV по занятиям, студентам и дням."""
+import csv
+import io
+from datetime import datetime, time as dtime, timedelta
+
+import pytest
+
+from models import db, Attendance
+from term import academic_term
+
+URL = '/api/teacher/attendance/export?format=csv'
+
+
+@pytest.fixture
+def seeded(flask_app, make_lesson):
+    """Две группы одного преподавателя в первый день семестра; первый студент группы A отмечен."""
+    day = academic_term.start
+    a = make_lesson(students=2, group='A', day=day, subject='Физика')
+    b = make_lesson(students=1, group='B', day=day, start=dtime(11), end=dtime(12, 30), subject='Химия',
+                    teacher_id=a.teacher_id)
+    with flask_app.app_context():
+        db.session.add(Attendance(student_id=a.student_ids[0], schedule_item_id=a.item_id, date=day,
+                                  scanned_at=datetime.combine(day, dtime(9, 5, 30))))
+        db.session.commit()
+    return a.teacher_id, day
+
+
+def rows(resp):
+    assert resp.status_code == 200 and resp.mimetype == 'text/csv'
+    header, *body = csv.reader(io.StringIO(resp.get_data(as_text=True).lstrip('﻿')))
+    assert header[0] == 'Группа'
+    return body
+
+
+def test_range_export_rows(seeded, login):
+    teacher_id, day = seeded
+    client = login(teacher_id)
+    # Две недели: занятия по нечётным неделям попадают в отрезок один раз
+    body = rows(client.get(f'{URL}&from={day}&to={day + timedelta(days=13)}'))
+    assert [row[:2] + row[3:] for row in body] == [
+        ['A', 'Физика', 'A-1-s0', 'Присутствует', day.isoformat(), '09:05:30'],
+        ['A', 'Физика', 'A-1-s1', 'Отсутствует', day.isoformat(), ''],
+        ['B', 'Химия', 'B-2-s0', 'Отсутствует', day.isoformat(), ''],
+    ]
+
+    # Четыре недели — второе занятие через две недели, без отметок
+    body = rows(client.get(f'{URL}&from={day}&to={day + timedelta(days=27)}&group=A'))
+    later = (day + timedelta(days=14)).isoformat()
+    assert [(row[0], row[3], row[5]) for row in body] == [
+        ('A', 'A-1-s0', day.isoformat()), ('A', 'A-1-s1', day.isoformat()),
+        ('A', 'A-1-s0', later), ('A', 'A-1-s1', later),
+    ]
+    assert {row[4] for row in body[2:]} == {'Отсутствует'}
+
+
+def test_export_without_lessons_has_placeholder_row(seeded, login):
+    teacher_id, day = seeded
+    start, end = day + timedelta(days=1), day + timedelta(days=2)
+    body = rows(login(teacher_id).get(f'{URL}&from={start}&to={end}'))
+    assert body == [['', '', '', 'Нет данных', '', f'{start}_{end}', '']]
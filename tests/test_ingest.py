@@ -0,0 +1,91 @@
+"""Отложенная запись сканов: пакеты, отвергнутые строки и остаток очереди на диске."""
+import json
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import ingest
+from ingest import AttendanceQueue
+from models import db, Attendance
+
+DAY = date(2025, 9, 1)
+
+
+@pytest.fixture
+def lesson(make_lesson):
+    lesson = make_lesson(students=5)
+    return lesson.student_ids, lesson.item_id
+
+
+def make_queue(flask_app, tmp_path, **kwargs):
+    return AttendanceQueue(flask_app, spill_path=str(tmp_path / 'spill.jsonl'),
+                           dead_letter_path=str(tmp_path / 'dead.jsonl'), **kwargs)
+
+
+def stored(flask_app):
+    with flask_app.app_context():
+        return sorted(db.session.query(Attendance.student_id, Attendance.schedule_item_id, Attendance.date))
+
+
+def test_scans_are_written_in_one_batch_and_duplicates_rejected(flask_app, tmp_path, lesson):
+    students, item_id = lesson
+    queue = make_queue(flask_app, tmp_path, batch_size=len(students), flush_interval=1)
+    with flask_app.test_request_context():
+        assert all(queue.submit(student_id, item_id, DAY) for student_id in students)
+        assert not queue.submit(students[0], item_id, DAY)  # ещё в очереди
+
+        deadline = time.monotonic() + 5
+        while queue.depth() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = queue.stats()
+        assert (stats['batches_total'], stats['inserted_total']) == (1, len(students))
+        assert not queue.submit(students[0], item_id, DAY)  # уже в БД
+    queue.stop()
+    assert stored(flask_app) == [(student_id, item_id, DAY) for student_id in sorted(students)]
+
+
+def test_rejected_row_is_dead_lettered_once_despite_db_error(flask_app, tmp_path, lesson, monkeypatch):
+    students, item_id = lesson
+    queue = make_queue(flask_app, tmp_path)
+    batch = [(students[0], item_id, DAY), (None, item_id, DAY), (students[1], item_id, DAY)]
+
+    # Сбой БД на последней строке при записи по одной: повтор не должен снова трогать плохую строку
+    insert_attendance = ingest.insert_attendance
+    calls = []
+
+    def flaky(rows):
+        calls.append(rows)
+        if len(calls) == 4:
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        return insert_attendance(rows)
+
+    monkeypatch.setattr(ingest, 'insert_attendance', flaky)
+    assert queue._flush_with_retry(batch)
+
+    with open(tmp_path / 'dead.jsonl', encoding='utf-8') as f:
+        assert [json.loads(line)[:3] for line in f] == [[None, item_id, DAY.isoformat()]]
+    assert queue.stats()['dead_letter_total'] == 1
+    assert queue.stats()['errors_total'] == 2
+    assert stored(flask_app) == [(student_id, item_id, DAY) for student_id in sorted(students[:2])]
+
+
+def test_spilled_scans_are_replayed_by_one_worker(flask_app, tmp_path, lesson, monkeypatch):
+    students, item_id = lesson
+    keys = [(student_id, item_id, DAY) for student_id in students]
+    make_queue(flask_app, tmp_path)._spill(keys)
+
+    # Второй воркер увидел файл, но первый забрал его раньше
+    monkeypatch.setattr(ingest.glob, 'glob', lambda pattern: [str(tmp_path / 'spill-1.jsonl')])
+    other = make_queue(flask_app, tmp_path)
+    other._replay_spill()
+    assert other.depth() == 0
+    monkeypatch.undo()
+
+    queue = make_queue(flask_app, tmp_path, flush_interval=0.05)
+    with flask_app.test_request_context():
+        queue._ensure_started()
+    queue.stop()
+    assert list(tmp_path.glob('spill*')) == []
+    assert stored(flask_app) == sorted(keys)
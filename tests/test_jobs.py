@@ -0,0 +1,85 @@
+"""Фоновые задачи: статус и результат видны из любого воркера."""
+
+
+def _fetch_job(events, login, teacher_id, id_path):
+    # Воркер запущен до постановки задачи: в его памяти о ней ничего нет
+    client = login(teacher_id)
+    events['ready'].set()
+    events['changed'].wait(10)
+    job_id = id_path.read_text()
+    status = client.get(f'/api/jobs/{job_id}')
+    download = client.get(f'/api/jobs/{job_id}/download')
+    return status.status_code, status.get_json().get('status'), download.status_code, download.data
+
+
+def test_job_is_visible_from_other_worker(app_module, flask_app, login, wait_job, other_worker, monkeypatch, tmp_path):
+    from models import db, User
+
+    monkeypatch.setattr(app_module.job_runner, 'result_dir', str(tmp_path))
+    with flask_app.app_context():
+        teacher = User(username='t', role='teacher', password_hash='-')
+        db.session.add(teacher)
+        db.session.commit()
+        teacher_id = teacher.id
+
+    id_path = tmp_path / 'job_id'
+    process, events = other_worker(_fetch_job, login, teacher_id, id_path)
+    assert events['ready'].wait(10)
+
+    client = login(teacher_id)
+    resp = client.get('/api/teacher/attendance/export?format=csv&background=1')
+    assert resp.status_code == 202
+    job_id = resp.get_json()['id']
+    id_path.write_text(job_id)
+    assert wait_job(job_id)['status'] == 'done'
+    events['changed'].set()
+
+    status_code, status, download_code, body = events['result'].get(timeout=10)
+    assert (status_code, status, download_code) == (200, 'done', 200)
+    with open(tmp_path / job_id, 'rb') as f:
+        assert body == f.read()
+
+
+def test_job_of_other_user_and_bad_id_are_not_found(app_module, flask_app, login, wait_job, monkeypatch, tmp_path):
+    from models import db, User
+
+    monkeypatch.setattr(app_module.job_runner, 'result_dir', str(tmp_path))
+    with flask_app.app_context():
+        owner = User(username='t1', role='teacher', password_hash='-')
+        other = User(username='t2', role='teacher', password_hash='-')
+        db.session.add_all([owner, other])
+        db.session.commit()
+        owner_id, other_id = owner.id, other.id
+
+    resp = login(owner_id).get('/api/teacher/attendance/export?format=csv&background=1')
+    job_id = resp.get_json()['id']
+    wait_job(job_id)
+    assert login(other_id).get(f'/api/jobs/{job_id}').status_code == 404
+    assert login(owner_id).get('/api/jobs/..%2F..%2Fetc').status_code == 404
+
+
+def test_failed_state_save_frees_owner_slot(flask_app, tmp_path, monkeypatch):
+    from jobs import JobRunner
+
+    runner = JobRunner(flask_app, result_dir=str(tmp_path), max_per_owner=1)
+
+    @runner.register('noop')
+    def noop(output):
+        return 'noop.txt', 'text/plain'
+
+    save = runner._save
+
+    def broken_save(job):
+        if job['status'] == 'running':
+            raise OSError('диск заполнен')
+        save(job)
+
+    monkeypatch.setattr(runner, '_save', broken_save)
+    job = runner.submit('noop', owner_id=1)
+    runner._executor.shutdown(wait=True)
+    assert runner.get(job['id'])['status'] == 'failed'
+    assert (runner.stats()['failed_total'], runner.stats()['active']) == (1, 0)
+
+    runner._executor = None
+    runner.submit('noop', owner_id=1)  # слот владельца освобождён
+    runner._executor.shutdown(wait=True)
@@ -0,0 +1,75 @@
+"""Живая лента: короткие потоки и переподключение с Last-Event-ID."""
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+
+def read_events(resp):
+    events = []
+    for message in resp.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if ': ' in line)
+        if 'event' in fields:
+            events.append(fields)
+    return events
+
+
+@pytest.fixture
+def lesson(app_module, make_lesson, monkeypatch):
+    monkeypatch.setattr(app_module, 'LIVE_STREAM_SECONDS', 0.1)
+    lesson = make_lesson(students=3, group='G1')
+    return lesson.teacher_id, lesson.item_id, lesson.student_ids
+
+
+def test_stream_ends_and_resumes_without_snapshot(flask_app, lesson, login):
+    from helpers import mark_attendance
+
+    teacher_id, item_id, student_ids = lesson
+    day = date(2025, 9, 1)
+    url = f'/api/teacher/attendance/live?item_id={item_id}&date={day}'
+    client = login(teacher_id)
+    with flask_app.app_context():
+        mark_attendance(student_ids[0], item_id, day)
+
+    events = read_events(client.get(url))
+    assert [e['event'] for e in events] == ['snapshot', 'end']
+    assert events[0]['id'] == events[-1]['id']
+
+    # Отметки между соединениями приходят после переподключения, без повторного снимка;
+    # отметки из окна перекрытия приходят повторно — клиент их игнорирует
+    with flask_app.app_context():
+        mark_attendance(student_ids[1], item_id, day)
+        mark_attendance(student_ids[2], item_id, day)
+    resumed = read_events(client.get(url, headers={'Last-Event-ID': events[-1]['id']}))
+    assert [e['event'] for e in resumed] == ['scan', 'scan', 'scan', 'end']
+    assert datetime.fromisoformat(resumed[-1]['id']) > datetime.fromisoformat(events[-1]['id'])
+
+
+def test_resume_picks_up_rows_committed_out_of_order(flask_app, lesson, login, count_queries):
+    from helpers import insert_attendance
+    from models import db
+
+    teacher_id, item_id, student_ids = lesson
+    day = date(2025, 9, 1)
+    url = f'/api/teacher/attendance/live?item_id={item_id}&date={day}'
+    client = login(teacher_id)
+    now = datetime.utcnow()
+    with flask_app.app_context():
+        insert_attendance([{'student_id': student_ids[0], 'schedule_item_id': item_id, 'date': day,
+                            'scanned_at': now}])
+        db.session.commit()
+    cursor = read_events(client.get(url))[-1]['id']
+    assert cursor == now.isoformat()
+
+    # Транзакция, начатая раньше (меньший scanned_at), закоммичена после выдачи курсора
+    with flask_app.app_context():
+        insert_attendance([{'student_id': student_ids[1], 'schedule_item_id': item_id, 'date': day,
+                            'scanned_at': now - timedelta(seconds=2)}])
+        db.session.commit()
+    client.get(url, headers={'Last-Event-ID': cursor})  # прогреваем кэш имён и занятия
+
+    with count_queries() as qc:
+        resumed = read_events(client.get(url, headers={'Last-Event-ID': cursor}))
+    assert {json.loads(e['data'])['id'] for e in resumed if e['event'] == 'scan'} == set(student_ids[:2])
+    assert resumed[-1]['id'] == cursor
+    assert qc.count == 1  # только дочитывание отметок
@@ -0,0 +1,21 @@
+"""setup_logging настраивает только логгеры приложения."""
+import logging
+
+from instrumentation import RateLimitFilter, setup_logging
+
+
+def test_app_import_leaves_root_logger_alone(app_module):
+    root = logging.getLogger()
+    assert not any(isinstance(f, RateLimitFilter) for h in root.handlers for f in h.filters)
+    assert not logging.getLogger('httpx').isEnabledFor(logging.INFO)
+    assert logging.getLogger('app').isEnabledFor(logging.INFO)
+
+
+def test_setup_logging_is_idempotent_and_rate_limited(capsys):
+    names = ('qr-test-a', 'qr-test-b')
+    setup_logging('INFO', burst=2, loggers=names)
+    setup_logging('INFO', burst=2, loggers=names)
+    assert [len(logging.getLogger(name).handlers) for name in names] == [1, 1]
+    for _ in range(5):
+        logging.getLogger('qr-test-a').info('одно и то же')
+    assert capsys.readouterr().err.count('одно и то же') == 2
@@ -0,0 +1,56 @@
+"""Метрики: доступ к /metrics*, профили без путей с токенами, сэмплер при исключении."""
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from instrumentation import Instrumentation
+
+
+def test_metrics_need_token_or_loopback(flask_app, app_module, monkeypatch):
+    client = flask_app.test_client()
+    remote = {'REMOTE_ADDR': '10.0.0.7'}
+    assert client.get('/api/metrics').status_code == 200  # локальный агент
+    assert client.get('/metrics/profiles', environ_base=remote).status_code == 403
+
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}, environ_base=remote).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'}, environ_base=remote)
+    assert response.status_code == 200
+    assert 'qr_attendance_db_pool_' in response.get_data(as_text=True)
+
+
+@pytest.fixture
+def profiled():
+    app = Flask(__name__)
+    instrumentation = Instrumentation(slow_ms=0, profile_rate=1.0, profile_interval=0.001)
+    instrumentation.init_app(app)
+
+    @app.route('/qr-image/<int:item_id>/<token>')
+    def qr_image(item_id, token):
+        time.sleep(0.05)  # сэмплер успевает снять стеки
+        return 'ok'
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    return app, instrumentation
+
+
+def test_profile_records_route_rule_not_path(profiled):
+    app, instrumentation = profiled
+    app.test_client().get('/qr-image/7/secret-token')
+    (profile,) = instrumentation.profiles
+    assert profile['rule'] == '/qr-image/<int:item_id>/<token>'
+    assert 'secret-token' not in str(profile)
+
+
+def test_sampler_is_stopped_after_unhandled_exception(profiled):
+    app, instrumentation = profiled
+    app.config['PROPAGATE_EXCEPTIONS'] = True  # after_request не вызывается
+    with pytest.raises(RuntimeError):
+        app.test_client().get('/boom')
+    assert threading.get_ident() not in instrumentation.sampler._threads
@@ -0,0 +1,65 @@
+"""QR: после конца занятия токены не выдаются и сканы не принимаются; картинка кэшируется по ETag."""
+from datetime import date, time as dtime
+
+
+def today_lesson(make_lesson, end):
+    teacher_id, item_id, (student_id,), _ = make_lesson(students=1, day=date.today(), start=dtime(0, 0), end=end)
+    return teacher_id, student_id, item_id
+
+
+def scan(client, item_id, token):
+    return client.post('/api/scan', json={'item_id': str(item_id), 'date': date.today().isoformat(),
+                                          'token': token})
+
+
+def test_ended_lesson_gets_no_tokens_and_no_scans(app_module, make_lesson, login):
+    teacher_id, student_id, item_id = today_lesson(make_lesson, end=dtime(0, 0, 1))
+    assert login(teacher_id).get(f'/api/qr/{item_id}/token').status_code == 410
+
+    # Подписанный токен без открытой сессии (другой воркер, сессия истекла) тоже не проходит
+    token = app_module.serializer.dumps(f'{item_id}:{date.today().isoformat()}')
+    response = scan(login(student_id), item_id, token)
+    assert response.status_code == 410
+
+
+def test_running_lesson_issues_tokens_and_accepts_scans(make_lesson, login):
+    teacher_id, student_id, item_id = today_lesson(make_lesson, end=dtime(23, 59, 59))
+    token = login(teacher_id).get(f'/api/qr/{item_id}/token').get_json()['token']
+    assert scan(login(student_id), item_id, token).status_code == 200
+
+
+def test_qr_image_etag_and_svg(flask_app, make_lesson, login):
+    teacher_id, _, item_id = today_lesson(make_lesson, end=dtime(23, 59, 59))
+    image_url = login(teacher_id).get(f'/api/qr/{item_id}/token').get_json()['image_url']
+    client = flask_app.test_client()  # картинку видят и без входа
+
+    png = client.get(image_url)
+    assert png.status_code == 200 and png.mimetype == 'image/png'
+    assert png.data.startswith(b'\x89PNG') and png.headers['ETag']
+    assert 'max-age' in png.headers['Cache-Control']
+    cached = client.get(image_url, headers={'If-None-Match': png.headers['ETag']})
+    assert cached.status_code == 304 and cached.data == b''
+
+    svg = client.get(image_url + '?format=svg')
+    assert svg.status_code == 200 and svg.mimetype == 'image/svg+xml' and b'<svg' in svg.data
+    assert svg.headers['ETag'] != png.headers['ETag']
+    assert client.get(image_url + '?format=svg', headers={'If-None-Match': png.headers['ETag']}).status_code == 200
+
+
+def test_token_endpoint(flask_app, make_lesson, login):
+    teacher_id, student_id, item_id = today_lesson(make_lesson, end=dtime(23, 59, 59))
+    other_teacher_id = make_lesson().teacher_id
+    teacher = login(teacher_id)
+
+    data = teacher.get(f'/api/qr/{item_id}/token').get_json()
+    assert (data['item_id'], data['date']) == (item_id, date.today().isoformat())
+    assert data['expires_in'] > 0 and 'svg' not in data
+    assert data['image_url'].endswith(f'/{item_id}/{data["date"]}/{data["token"]}')
+
+    # ?inline=1 — та же картинка, что отдаёт /qr-image
+    inline = teacher.get(f'/api/qr/{item_id}/token?inline=1').get_json()
+    image = flask_app.test_client().get(inline['image_url'] + '?format=svg')
+    assert inline['svg'] == image.get_data(as_text=True)
+
+    assert login(student_id).get(f'/api/qr/{item_id}/token').status_code == 403
+    assert login(other_teacher_id).get(f'/api/qr/{item_id}/token').status_code == 404
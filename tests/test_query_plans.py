@@ -0,0 +1,80 @@
+"""Планы запросов горячих маршрутов на наполненной БД: все обращения идут по индексам.
+
+Маршруты вызываются через тестовый клиент, их SELECT-ы перехватываются и прогоняются
+через EXPLAIN (на SQLite — EXPLAIN QUERY PLAN). Полный просмотр таблицы — ошибка.
+С TEST_DATABASE_URL=postgresql://... проверяются планы Postgres.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def university(app_module, flask_app, make_university):
+    from models import db
+
+    university = make_university(teachers=20, groups=40, students=25, items=12, weeks=6)
+    with flask_app.app_context():
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        # Индекс расписания читает шаблон целиком один раз на версию — это не запрос маршрута
+        app_module.timetable_index.snapshot()
+    return university
+
+
+def capture(engine, fn):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    return statements
+
+
+def full_scans(engine, statement, parameters):
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            plan = [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+            # "SCAN users" без "USING ... INDEX" — полный просмотр таблицы
+            return [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+        plan = [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+        return [line for line in plan if 'Seq Scan' in line]
+
+
+def test_hot_routes_use_indexes(app_module, flask_app, engine, login, university):
+    lesson = university.lessons[0]
+    item_id, group, teacher_id = lesson[:3]
+    student_id = university.students_by_group[group][0]
+    teacher = login(teacher_id)
+    student = login(student_id)
+    anonymous = flask_app.test_client()
+    today = date.today().isoformat()
+    token = app_module.serializer.dumps(f"{item_id}:{today}")
+    history_day = university.history_start.isoformat()
+    with flask_app.app_context():
+        username = app_module.db.session.get(app_module.User, student_id).username
+
+    routes = {
+        '/teacher': lambda: teacher.get('/teacher'),
+        '/student': lambda: student.get('/student'),
+        '/api/teacher/attendance': lambda: teacher.get(f'/api/teacher/attendance?date={history_day}'),
+        '/api/attendance': lambda: student.get('/api/attendance'),
+        '/api/scan': lambda: student.post('/api/scan', json={'item_id': str(item_id), 'date': today,
+                                                             'token': token}),
+        '/login': lambda: anonymous.post('/login', data={'username': username, 'password': 'x',
+                                                          'role': 'student'}),
+    }
+    problems = {}
+    for name, call in routes.items():
+        for statement, parameters in capture(engine, call):
+            bad = full_scans(engine, statement, parameters)
+            if bad:
+                problems.setdefault(name, []).append(f"{' | '.join(bad)}: {statement}")
+    assert not problems, problems
@@ -0,0 +1,50 @@
+"""Регрессия N+1: число запросов списка посещаемости и экспорта не зависит от размера группы."""
+from datetime import timedelta, time as dtime
+
+import pytest
+
+GROUPS = 5
+
+
+@pytest.fixture
+def measure(flask_app, make_lesson, login, count_queries):
+    """measure(студентов в группе, url) -> (SQL-запросов на повторный запрос, ответ)."""
+    from models import db, Attendance
+    from term import academic_term
+
+    def measure(students_per_group, url):
+        target = academic_term.start + timedelta(days=15)
+        teacher_id = None
+        for g in range(GROUPS):
+            lesson = make_lesson(students_per_group, group=f'G-{g}', day=target, start=dtime(9 + g, 0),
+                                 end=dtime(9 + g, 45), subject=f'Предмет {g}', teacher_id=teacher_id)
+            teacher_id = lesson.teacher_id
+            with flask_app.app_context():
+                db.session.add_all(Attendance(student_id=s, schedule_item_id=lesson.item_id, date=target)
+                                   for s in lesson.student_ids[::2])
+                db.session.commit()
+        client = login(teacher_id)
+        client.get(f'{url}?date={target}')  # прогрев: кэш пользователя, индекс расписания
+        with count_queries() as qc:
+            resp = client.get(f'{url}?date={target}')
+        assert resp.status_code == 200
+        return qc.count, resp
+    return measure
+
+
+@pytest.mark.parametrize('url', ['/api/teacher/attendance', '/api/teacher/attendance/export'])
+def test_query_count_does_not_grow_with_group(measure, reset_db, url):
+    counts = []
+    for size in (5, 30, 120):
+        reset_db()
+        counts.append(measure(size, url)[0])
+    assert len(set(counts)) == 1, counts
+
+
+def test_roster_marks_every_other_student(measure):
+    _, resp = measure(6, '/api/teacher/attendance')
+    lessons = resp.get_json()['lessons']
+    assert len(lessons) == GROUPS
+    for lesson in lessons:
+        assert [s['attended'] for s in lesson['students']] == [True, False] * 3
+        assert all(s['timestamp'] for s in lesson['students'] if s['attended'])
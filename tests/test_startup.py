@@ -0,0 +1,10 @@
+"""Импорт app.py в новом процессе не тянет тяжёлые библиотеки и не создаёт таблиц."""
+import sys
+
+from bench.startup import HEAVY_MODULES, run_child
+
+
+def test_import_is_light_and_leaves_db_alone():
+    result = run_child(sys.executable)
+    assert result['heavy'] == [], f"при старте импортированы {result['heavy']} из {HEAVY_MODULES}"
+    assert result['tables'] == []
@@ -0,0 +1,125 @@
+"""Кэш развёрнутого расписания: ETag, сброс при изменении, гонка с коммитом, другой воркер."""
+import time
+
+import pytest
+
+import helpers
+from models import db, User, ScheduleItem
+
+URL = '/api/teacher/schedule?from=2025-09-01&to=2025-09-14'
+
+
+@pytest.fixture
+def seed(flask_app, make_lesson):
+    """Два преподавателя, у первого — «Физика»: ((id первого, id второго), id занятия)."""
+    lesson = make_lesson(subject='Физика', group='G1', room='101')
+    with flask_app.app_context():
+        other = User(username='other-teacher', role='teacher', password_hash='-')
+        db.session.add(other)
+        db.session.commit()
+        return (lesson.teacher_id, other.id), lesson.item_id
+
+
+def subjects(resp):
+    return sorted({lesson['subject'] for lessons in resp.get_json().values() for lesson in lessons})
+
+
+def rename(item_id, subject):
+    db.session.get(ScheduleItem, item_id).subject = subject
+    db.session.commit()
+
+
+def test_etag_and_invalidation(flask_app, seed, login):
+    (teacher_id, _), item_id = seed
+    client = login(teacher_id)
+    first = client.get(URL)
+    assert subjects(first) == ['Физика']
+    assert client.get(URL, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    with flask_app.app_context():
+        rename(item_id, 'Химия')
+    second = client.get(URL, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200 and subjects(second) == ['Химия']
+
+
+def test_calendar_read_before_commit_is_not_cached(seed, monkeypatch, login):
+    (teacher_id, _), item_id = seed
+    expand = helpers.expand_schedule_to_semester
+
+    def expand_then_commit(*args):
+        # Пока этот запрос считал расписание, другой успел изменить занятие
+        result = expand(*args)
+        monkeypatch.setattr(helpers, 'expand_schedule_to_semester', expand)
+        rename(item_id, 'Химия')
+        return result
+
+    monkeypatch.setattr(helpers, 'expand_schedule_to_semester', expand_then_commit)
+    client = login(teacher_id)
+    assert subjects(client.get(URL)) == ['Физика']
+    assert subjects(client.get(URL)) == ['Химия']
+
+
+def test_reassigned_lesson_leaves_old_teacher_calendar(flask_app, seed, login):
+    (old_teacher, new_teacher), item_id = seed
+    client = login(old_teacher)
+    assert subjects(client.get(URL)) == ['Физика']
+    with flask_app.app_context():
+        db.session.get(ScheduleItem, item_id).teacher_id = new_teacher
+        db.session.commit()
+    assert subjects(client.get(URL)) == []
+    assert subjects(login(new_teacher).get(URL)) == ['Физика']
+
+
+def _poll_calendar(events, login, teacher_id, expected, timeout):
+    client = login(teacher_id)
+    client.get(URL)  # расписание в локальном кэше этого воркера
+    events['ready'].set()
+    events['changed'].wait(10)
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        if subjects(client.get(URL)) == expected:
+            return time.monotonic() - t0
+        time.sleep(0.05)
+    return None
+
+
+def test_other_worker_sees_change_with_local_backend(flask_app, seed, other_worker, login, monkeypatch):
+    from cache import shared_cache
+
+    monkeypatch.setattr(shared_cache, 'local_max_ttl', 0.5)
+    (teacher_id, _), item_id = seed
+    process, events = other_worker(_poll_calendar, login, teacher_id, ['Химия'], 5)
+    assert events['ready'].wait(10)
+    with flask_app.app_context():
+        rename(item_id, 'Химия')
+    events['changed'].set()
+    elapsed = events['result'].get(timeout=10)
+    assert elapsed is not None and elapsed <= 1.5
+
+
+def test_each_window_is_cached_separately(seed, monkeypatch, login):
+    from cache import shared_cache
+
+    (teacher_id, _), _ = seed
+    client = login(teacher_id)
+    client.get('/api/teacher/schedule')  # весь семестр
+    client.get(URL)
+
+    read = []
+    get = shared_cache.get
+    monkeypatch.setattr(shared_cache, 'get', lambda key, default=None: read.append(key) or get(key, default))
+    assert subjects(client.get(URL)) == ['Физика']
+    # Поколение и своё окно — семестр при запросе двух недель не читается
+    read = [key for key in read if key.startswith('schedule:')]
+    assert len(read) == 2 and read[1].endswith(':2025-09-01:2025-09-14')
+    assert isinstance(get(read[1]), tuple)
+
+
+def test_window_cap_applies_to_stream(seed, login):
+    (teacher_id, _), _ = seed
+    client = login(teacher_id)
+    year = '/api/teacher/schedule?from=2025-09-01&to=2026-08-31&stream=1'
+    assert subjects(client.get(year)) == ['Физика']
+    for url in ('/api/teacher/schedule?from=2025-09-01&to=2027-09-01',
+                '/api/teacher/schedule?from=2025-09-01&to=2027-09-01&stream=1'):
+        assert client.get(url).status_code == 400
@@ -0,0 +1,42 @@
+"""Учебный семестр: календарные недели и границы из окружения."""
+from datetime import date, timedelta
+
+from term import AcademicTerm
+
+
+def test_weeks_start_on_monday_for_midweek_start():
+    term = AcademicTerm(date(2025, 9, 3), date(2025, 12, 31))  # среда
+    assert term.week(date(2025, 9, 3)) == (1, 1)
+    assert term.week(date(2025, 9, 7)) == (1, 1)   # воскресенье той же недели
+    assert term.week(date(2025, 9, 8)) == (2, 0)   # понедельник — следующая неделя
+    assert term.week(date(2025, 9, 9)) == (2, 0)
+    assert term.week(date(2025, 9, 15)) == (3, 1)
+    assert term.week(date(2025, 8, 31)) == (0, 0)  # до начала семестра — та же формула
+
+
+def test_lesson_dates_follow_calendar_weeks():
+    term = AcademicTerm(date(2026, 9, 1), date(2026, 12, 31))  # вторник
+    mondays = list(term.iter_lesson_dates(1, 0, term.start, date(2026, 9, 30)))
+    assert mondays == [date(2026, 9, 7), date(2026, 9, 21)]
+    for day in term.iter_lesson_dates(3, 1, term.start - timedelta(days=30), term.end):
+        assert day.isoweekday() == 3 and term.week(day)[1] == 1
+    assert term.count_lessons(1, 0, term.start, date(2026, 9, 30)) == 2
+
+
+def test_classes_end_defaults_to_term_end_when_term_is_configured(monkeypatch):
+    monkeypatch.setenv('TERM_START', '2026-02-02')
+    monkeypatch.setenv('TERM_END', '2026-06-30')
+    monkeypatch.delenv('TERM_CLASSES_END', raising=False)
+    term = AcademicTerm.from_env()
+    assert term.classes_end == date(2026, 6, 30)
+    assert term.count_lessons(1, 1, term.start, term.classes_end) > 0
+
+    monkeypatch.setenv('TERM_CLASSES_END', '2026-06-10')
+    assert AcademicTerm.from_env().classes_end == date(2026, 6, 10)
+
+
+def test_default_term_keeps_exam_session(monkeypatch):
+    for name in ('TERM_START', 'TERM_END', 'TERM_CLASSES_END'):
+        monkeypatch.delenv(name, raising=False)
+    term = AcademicTerm.from_env()
+    assert (term.start, term.classes_end, term.end) == (date(2025, 9, 1), date(2025, 12, 20), date(2025, 12, 31))
@@ -0,0 +1,60 @@
+"""Индекс шаблона расписания и изменения занятий в другом воркере."""
+import time
+
+import pytest
+
+from cache import make_cache
+
+
+def _rename_item(events, item_id, subject):
+    from models import db, ScheduleItem
+
+    events['ready'].set()
+    events['changed'].wait(10)
+    db.session.get(ScheduleItem, item_id).subject = subject
+    db.session.commit()
+    return True
+
+
+def _subjects(flask_app, teacher_id):
+    from timetable import timetable_index
+
+    with flask_app.app_context():
+        return [lesson.subject for lesson in timetable_index.teacher_lessons(teacher_id, 1, 1)]
+
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_change_in_other_worker_reaches_lessons(flask_app, other_worker, make_lesson, monkeypatch, tmp_path,
+                                                 shared):
+    from cache import shared_cache
+    from timetable import timetable_index
+
+    if shared:
+        monkeypatch.setattr(shared_cache, 'backend', make_cache(f'sqlite:///{tmp_path / "cache.db"}'))
+    monkeypatch.setattr(timetable_index, 'check_interval', 0.2)
+    timetable_index.invalidate()
+    assert timetable_index.enabled == shared
+
+    teacher_id, item_id, _, _ = make_lesson(subject='Физика', group='G1')
+    assert _subjects(flask_app, teacher_id) == ['Физика']  # индекс (если включён) уже построен
+
+    process, events = other_worker(_rename_item, item_id, 'Химия')
+    assert events['ready'].wait(10)
+    events['changed'].set()
+    assert events['result'].get(timeout=10)
+
+    t0 = time.monotonic()
+    while _subjects(flask_app, teacher_id) != ['Химия']:
+        assert time.monotonic() - t0 < 2, 'изменение из другого воркера не видно'
+        time.sleep(0.05)
+    if not shared:
+        assert time.monotonic() - t0 < 0.05  # без индекса — сразу из БД
+
+
+def test_index_can_be_forced_on_with_local_cache(flask_app, make_lesson, monkeypatch):
+    from timetable import timetable_index
+
+    monkeypatch.setattr(timetable_index, '_enabled', True)
+    teacher_id = make_lesson(subject='Физика', group='G1').teacher_id
+    assert _subjects(flask_app, teacher_id) == ['Физика']
+    assert timetable_index.stats()['enabled'] and timetable_index.stats()['built']
@@ -0,0 +1,182 @@
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import db, ScheduleItem
+from cache import shared_cache
+
+# Шаблон расписания в памяти процесса для «занятий на сегодня» (/teacher, /student,
+# списки посещаемости). Шаблон меняется редко, поэтому держим неизменяемый снимок:
+# (teacher_id, день, чётность) и (группа, день, чётность) -> кортеж занятий по времени.
+# При изменении занятий снимок строится заново целиком и подменяется одной ссылкой —
+# читатели не ждут блокировок и не видят наполовину собранный индекс.
+#
+# Другие воркеры узнают об изменении по ключу timetable:version в общем кэше:
+# его сбрасывают после коммита (см. helpers._schedule_item_changed), а индекс
+# сверяется с ним не чаще раза в check_interval секунд. С локальным кэшем сброс
+# до других воркеров не доходит, поэтому индекс по умолчанию включён только с общим
+# бэкендом (Redis, SQLite), а без него занятия читаются из БД по индексам таблицы.
+
+TIMETABLE_VERSION_KEY = 'timetable:version'
+
+# Поля — как у ScheduleItem, так что шаблоны и build_roster принимают запись вместо модели
+Lesson = namedtuple('Lesson', ['id', 'day_of_week', 'week_parity', 'start_time', 'end_time',
+                               'subject', 'group_name', 'room', 'teacher_id'])
+
+
+class TimetableSnapshot:
+    __slots__ = ('version', 'by_teacher', 'by_group', 'lessons', 'build_seconds', 'memory_bytes', 'built_at')
+
+    def __init__(self, version, by_teacher, by_group, lessons, build_seconds, built_at):
+        self.version = version
+        self.by_teacher = by_teacher
+        self.by_group = by_group
+        self.lessons = lessons
+        self.build_seconds = build_seconds
+        self.built_at = built_at
+        self.memory_bytes = _deep_size((by_teacher, by_group))
+
+
+def _deep_size(root):
+    """Размер объектов индекса в байтах; общие объекты (строки, время) считаются один раз."""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, tuple):
+            stack.extend(obj)
+    return total
+
+
+def _build_slots(lessons, key):
+    slots = {}
+    for lesson in lessons:
+        slots.setdefault(key(lesson), []).append(lesson)
+    return {slot: tuple(items) for slot, items in slots.items()}
+
+
+_LESSON_COLUMNS = (ScheduleItem.id, ScheduleItem.day_of_week, ScheduleItem.week_parity,
+                   ScheduleItem.start_time, ScheduleItem.end_time, ScheduleItem.subject,
+                   ScheduleItem.group_name, ScheduleItem.room, ScheduleItem.teacher_id)
+
+
+class TimetableIndex:
+    def __init__(self, cache, check_interval=1.0, enabled=None):
+        self.cache = cache
+        self.check_interval = check_interval
+        self._enabled = enabled
+        self._snapshot = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.rebuilds_total = 0
+
+    def configure(self, check_interval=1.0, enabled=None):
+        """enabled=None — индекс включён, только если кэш общий для всех воркеров."""
+        self.check_interval = check_interval
+        self._enabled = enabled
+
+    @property
+    def enabled(self):
+        return self.cache.is_shared if self._enabled is None else self._enabled
+
+    def invalidate(self):
+        """Изменение в этом процессе: следующий запрос сверится с версией сразу."""
+        self._next_check = 0.0
+
+    def _current_version(self):
+        version = self.cache.get(TIMETABLE_VERSION_KEY)
+        if version is None:
+            # Ключ сброшен изменением (или кэш пуст) — заводим новую версию
+            version = uuid.uuid4().hex
+            self.cache.set(TIMETABLE_VERSION_KEY, version)
+        return version
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() < self._next_check:
+                return snapshot
+            # Версию читаем до загрузки: изменение после неё сбросит ключ, и мы перестроимся снова
+            version = self._current_version()
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self._build(version)
+                self.rebuilds_total += 1
+            self._next_check = time.monotonic() + self.check_interval
+            return snapshot
+
+    @staticmethod
+    def _build(version):
+        t0 = time.perf_counter()
+        strings = {}  # одинаковые названия групп и предметов — один объект на индекс
+        lessons = []
+        rows = db.session.execute(select(*_LESSON_COLUMNS).order_by(ScheduleItem.start_time, ScheduleItem.id))
+        for row in rows:
+            lessons.append(Lesson(
+                row.id, row.day_of_week, row.week_parity, row.start_time, row.end_time,
+                strings.setdefault(row.subject, row.subject),
+                strings.setdefault(row.group_name, row.group_name),
+                strings.setdefault(row.room, row.room),
+                row.teacher_id,
+            ))
+        return TimetableSnapshot(
+            version,
+            _build_slots(lessons, lambda lesson: (lesson.teacher_id, lesson.day_of_week, lesson.week_parity)),
+            _build_slots(lessons, lambda lesson: (lesson.group_name, lesson.day_of_week, lesson.week_parity)),
+            len(lessons),
+            time.perf_counter() - t0,
+            datetime.now().isoformat(timespec='seconds'),
+        )
+
+    @staticmethod
+    def _query(*where):
+        rows = db.session.execute(select(*_LESSON_COLUMNS).where(*where)
+                                  .order_by(ScheduleItem.start_time, ScheduleItem.id))
+        return tuple(Lesson(*row) for row in rows)
+
+    def teacher_lessons(self, teacher_id, day_of_week, week_parity):
+        """Занятия преподавателя в этот день недели и чётность, по времени начала."""
+        if not self.enabled:
+            return self._query(ScheduleItem.teacher_id == teacher_id, ScheduleItem.day_of_week == day_of_week,
+                               ScheduleItem.week_parity == week_parity)
+        return self.snapshot().by_teacher.get((teacher_id, day_of_week, week_parity), ())
+
+    def group_lessons(self, group_name, day_of_week, week_parity):
+        if not self.enabled:
+            return self._query(ScheduleItem.group_name == group_name, ScheduleItem.day_of_week == day_of_week,
+                               ScheduleItem.week_parity == week_parity)
+        return self.snapshot().by_group.get((group_name, day_of_week, week_parity), ())
+
+    def stats(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {'enabled': self.enabled, 'built': False, 'rebuilds_total': self.rebuilds_total}
+        return {
+            'enabled': self.enabled,
+            'built': True,
+            'lessons': snapshot.lessons,
+            'teacher_slots': len(snapshot.by_teacher),
+            'group_slots': len(snapshot.by_group),
+            'memory_bytes': snapshot.memory_bytes,
+            'build_seconds': round(snapshot.build_seconds, 4),
+            'built_at': snapshot.built_at,
+            'rebuilds_total': self.rebuilds_total,
+        }
+
+
+timetable_index = TimetableIndex(shared_cache)